@@ -9,7 +9,7 @@ from collision_detector import (
     compute_risk_for_agent, distance, INTERSECTION_CENTER,
     compute_ttc, get_velocity_components
 )
-from priority_negotiation import compute_decisions_for_all, compute_recommended_speed
+from priority_negotiation import compute_decisions_for_all, compute_recommended_speed, is_on_right
 from llm_brain import LLMBrain, LLM_ENABLED
 
 logger = logging.getLogger("agents")
@@ -63,6 +63,9 @@ class VehicleAgent:
 
         self._llm_brain = LLMBrain(agent_id)
 
+        self._tick = 0
+        self._nearby_cache = None
+
         self._fallback_history = []
         self._fallback_consecutive = 0
         self._fallback_last_action = None
@@ -410,6 +413,10 @@ class VehicleAgent:
 
 
     def _get_nearby_vehicles_info(self):
+        # reused across the several callers within one tick while our own state is unchanged
+        key = (self._tick, self.x, self.y, self.direction, self.speed)
+        if self._nearby_cache is not None and self._nearby_cache[0] == key:
+            return self._nearby_cache[1]
         others = channel.get_other_agents(self.agent_id)
         my_msg = self._build_message()
         rad = math.radians(self.direction)
@@ -444,11 +451,13 @@ class VehicleAgent:
                 "arrested": msg.arrested,
                 "dist": dist,
                 "ttc": ttc_str,
+                "ttc_value": ttc,
                 "decision": msg.decision,
                 "ahead_in_my_lane": is_ahead,
                 "gap": round(proj, 1) if is_ahead else None,
             }
             result.append(entry)
+        self._nearby_cache = (key, result)
         return result
 
 
@@ -548,6 +557,7 @@ class VehicleAgent:
         if LLM_ENABLED:
             traffic_light = self._get_traffic_light_str()
             nearby = self._get_nearby_vehicles_info()
+            self._llm_brain.memory.record_near_misses(nearby, self.risk_level)
             dist_to_stop = self._distance_to_stop_line()
             v2x_text = self._get_v2x_broadcasts_text()
 
@@ -721,11 +731,7 @@ class VehicleAgent:
             nearby = self._get_nearby_vehicles_info()
             all_safe = True
             for o in nearby:
-                ttc_str = o.get("ttc", "inf")
-                try:
-                    ttc_val = float(ttc_str.replace("s", "")) if isinstance(ttc_str, str) else float(ttc_str)
-                except (ValueError, AttributeError):
-                    ttc_val = float("inf")
+                ttc_val = o["ttc_value"]
                 if ttc_val < 5.0:
                     all_safe = False
                     break
@@ -748,11 +754,7 @@ class VehicleAgent:
                     nearby = self._get_nearby_vehicles_info()
                     for o in nearby:
                         if o["id"] == alert.from_id:
-                            ttc_str = o.get("ttc", "inf")
-                            try:
-                                ttc_val = float(ttc_str.replace("s", "")) if isinstance(ttc_str, str) else float(ttc_str)
-                            except (ValueError, AttributeError):
-                                ttc_val = float("inf")
+                            ttc_val = o["ttc_value"]
                             if ttc_val < 8.0:
                                 self.decision = "brake"
                                 self.reason = "v2x_drunk_driver_nearby"
@@ -764,18 +766,17 @@ class VehicleAgent:
                     nearby = self._get_nearby_vehicles_info()
                     for o in nearby:
                         if o["id"] == alert.from_id:
-                            ttc_str = o.get("ttc", "inf")
-                            try:
-                                ttc_val = float(ttc_str.replace("s", "")) if isinstance(ttc_str, str) else float(ttc_str)
-                            except (ValueError, AttributeError):
-                                ttc_val = float("inf")
+                            ttc_val = o["ttc_value"]
                             if ttc_val < 6.0:
                                 self.decision = "yield"
                                 self.reason = "v2x_vehicle_in_intersection"
                             break
 
-        msg = self._build_message()
-        self.recommended_speed = compute_recommended_speed(msg, self.decision, self.target_speed)
+        if self.decision == "go":
+            self.recommended_speed = self.target_speed
+        else:
+            msg = self._build_message()
+            self.recommended_speed = compute_recommended_speed(msg, self.decision, self.target_speed)
 
         following_cap = self._compute_following_speed()
         if following_cap < self.recommended_speed:
@@ -1054,7 +1055,6 @@ class VehicleAgent:
                 other_axis = "NS" if abs(math.cos(other_rad)) >= abs(math.sin(other_rad)) else "EW"
 
                 if my_axis != other_axis:
-                    from priority_negotiation import is_on_right
                     def _heading_to_approach(direction):
                         d = direction % 360
                         if 315 <= d or d < 45:
@@ -1151,6 +1151,7 @@ class VehicleAgent:
         TURN_CHANCE = 0.30
 
         while self._running:
+            self._tick += 1
             if self._arrested:
                 if self._process_arrest():
                     from simulation import simulation
@@ -1313,6 +1314,7 @@ class VehicleAgent:
                 time.sleep(UPDATE_INTERVAL)
                 continue
 
+            self._tick += 1
             self._make_decision()
             self._adjust_speed()
             self._update_position()
@@ -1353,11 +1355,5 @@ class VehicleAgent:
             "pulling_over": self._pulling_over,
             "arrested": self._arrested,
         }
-        llm_stats = self._llm_brain.get_stats()
-        state["llm_calls"] = llm_stats["llm_calls"]
-        state["llm_errors"] = llm_stats["llm_errors"]
-        state["memory_decisions"] = llm_stats.get("memory_decisions", 0)
-        state["near_misses"] = llm_stats.get("near_misses", 0)
-        state["v2x_alerts_received"] = llm_stats.get("v2x_alerts_received", 0)
-        state["lessons_learned"] = llm_stats.get("lessons_learned", 0)
+        state.update(self._llm_brain.get_summary())
         return state
@@ -1,13 +1,13 @@
 
+import itertools
 import math
-import time
 import random
 import threading
 import logging
 from typing import List, Tuple, Optional, Dict
 from agents import VehicleAgent
 from v2x_channel import channel
-from intersection_coordinator import IntersectionCoordinator
+from intersection_coordinator import IntersectionCoordinator, CoordinatedTrafficLight
 logger = logging.getLogger("background_traffic")
 
 GRID_COLS = 5
@@ -35,8 +35,6 @@ EMERGENCY_CHANCE = 0.08
 POLICE_CHANCE = 0.06
 MIN_SPAWN_DISTANCE = 45.0
 
-TRAFFIC_LIGHT_PHASE_DURATION = 12.0
-
 TRAFFIC_LIGHT_INTERSECTIONS = [
     (-200.0, 200.0),
     (200.0, 200.0),
@@ -51,26 +49,6 @@ _MIN_X, _MAX_X = min(_ALL_COL_X), max(_ALL_COL_X)
 _MIN_Y, _MAX_Y = min(_ALL_ROW_Y), max(_ALL_ROW_Y)
 
 
-class GridTrafficLight:
-    def __init__(self, x: float, y: float):
-        self.x = x
-        self.y = y
-        self.phase = "NS_GREEN"
-        self.phase_timer = random.uniform(0, TRAFFIC_LIGHT_PHASE_DURATION)
-
-    def update(self, dt: float):
-        self.phase_timer += dt
-        if self.phase_timer >= TRAFFIC_LIGHT_PHASE_DURATION:
-            self.phase_timer = 0.0
-            self.phase = "EW_GREEN" if self.phase == "NS_GREEN" else "NS_GREEN"
-
-    def is_green_for_axis(self, axis: str) -> bool:
-        return (axis == "NS") == (self.phase == "NS_GREEN")
-
-    def to_dict(self) -> dict:
-        return {"x": self.x, "y": self.y, "phase": self.phase}
-
-
 def get_grid_info() -> dict:
     return {
         "intersections": [{"x": ix, "y": iy} for ix, iy in INTERSECTIONS],
@@ -253,13 +231,10 @@ def _build_initial_route_from_intersection(ix, iy, direction):
     return wps
 
 
-_ALL_ROUTE_KEYS = []
-for cx in _ALL_COL_X:
-    _ALL_ROUTE_KEYS.append(("straight", "col", cx, 180.0))
-    _ALL_ROUTE_KEYS.append(("straight", "col", cx, 0.0))
-for ry in _ALL_ROW_Y:
-    _ALL_ROUTE_KEYS.append(("straight", "row", ry, 90.0))
-    _ALL_ROUTE_KEYS.append(("straight", "row", ry, 270.0))
+_ALL_ROUTE_KEYS = tuple(
+    [("straight", "col", cx, d) for cx in _ALL_COL_X for d in (180.0, 0.0)]
+    + [("straight", "row", ry, d) for ry in _ALL_ROW_Y for d in (90.0, 270.0)]
+)
 
 
 def _build_straight_route(axis, coord, direction):
@@ -307,13 +282,9 @@ class BackgroundTrafficManager:
         self._vehicles: Dict[str, VehicleAgent] = {}
         self._running = False
         self._thread: Optional[threading.Thread] = None
-        self._counter = 0
+        self._ids = itertools.count(1)
         self._lock = threading.Lock()
         self._coordinator = IntersectionCoordinator(INTERSECTIONS, GRID_SPACING)
-        self._traffic_lights: List[GridTrafficLight] = [
-            GridTrafficLight(x, y) for x, y in TRAFFIC_LIGHT_INTERSECTIONS
-        ]
-        self._tl_thread: Optional[threading.Thread] = None
         self._spawned = False
 
     @property
@@ -327,14 +298,8 @@ class BackgroundTrafficManager:
             if self._coordinator.get_light(x, y) is not None
         ]
 
-    def get_traffic_light_for(self, x: float, y: float) -> Optional[GridTrafficLight]:
-        light = self._coordinator.get_light(x, y)
-        if light:
-            return light
-        for tl in self._traffic_lights:
-            if abs(tl.x - x) < 1.0 and abs(tl.y - y) < 1.0:
-                return tl
-        return None
+    def get_traffic_light_for(self, x: float, y: float) -> Optional[CoordinatedTrafficLight]:
+        return self._coordinator.get_light(x, y)
 
     def start(self):
         if self._running:
@@ -349,8 +314,6 @@ class BackgroundTrafficManager:
                 for v in self._vehicles.values():
                     if not v._running:
                         v.start()
-        self._tl_thread = threading.Thread(target=self._tl_loop, daemon=True)
-        self._tl_thread.start()
         logger.info("Background traffic started")
 
     def stop(self):
@@ -364,13 +327,6 @@ class BackgroundTrafficManager:
         self._spawned = False
         logger.info("Background traffic stopped")
 
-    def _tl_loop(self):
-        dt = 0.2
-        while self._running:
-            for tl in self._traffic_lights:
-                tl.update(dt)
-            time.sleep(dt)
-
     def _is_spawn_blocked(self, start_x: float, start_y: float) -> bool:
         with self._lock:
             for v in self._vehicles.values():
@@ -401,13 +357,13 @@ class BackgroundTrafficManager:
             is_emergency = random.random() < EMERGENCY_CHANCE
             is_police = (not is_emergency) and (random.random() < POLICE_CHANCE)
 
-            self._counter += 1
+            n = next(self._ids)
             if is_emergency:
-                agent_id = f"AMBULANCE_{self._counter:03d}"
+                agent_id = f"AMBULANCE_{n:03d}"
             elif is_police:
-                agent_id = f"POLICE_{self._counter:03d}"
+                agent_id = f"POLICE_{n:03d}"
             else:
-                agent_id = f"BG_{self._counter:03d}"
+                agent_id = f"BG_{n:03d}"
 
             initial_wps = _build_initial_route_from_intersection(ix, iy, direction)
             route_wps = initial_wps[1:] if len(initial_wps) > 1 else []
@@ -1,7 +1,11 @@
 
 import math
-from typing import Dict, Tuple
-from v2x_channel import V2XMessage
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from v2x_channel import V2XMessage, channel
 
 INTERSECTION_CENTER = (0.0, 0.0)
 INTERSECTION_RADIUS = 30.0
@@ -11,11 +15,25 @@ TTC_COLLISION = 3.0
 TTC_HIGH = 6.0
 TTC_MEDIUM = 10.0
 
+RISK_LEVELS = ("low", "medium", "high", "collision")
+# below this many agents the per-pair Python loop beats the NumPy call overhead
+VECTOR_MIN_AGENTS = 10
+
+# agent id families; pairs inside BG_ or AMBULANCE_ are not shown as collision pairs
+GROUP_NORMAL, GROUP_BG, GROUP_AMBULANCE = 0, 1, 2
+SAME_GROUP_SKIP = (GROUP_BG, GROUP_AMBULANCE)
+
 
 def distance(x1: float, y1: float, x2: float, y2: float) -> float:
     return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
 
+def distance_sq(x1: float, y1: float, x2: float, y2: float) -> float:
+    dx = x2 - x1
+    dy = y2 - y1
+    return dx * dx + dy * dy
+
+
 def get_velocity_components(speed: float, direction: float) -> Tuple[float, float]:
     rad = math.radians(direction)
     vx = speed * math.sin(rad)
@@ -122,6 +140,129 @@ def assess_intersection_risk(agent1: V2XMessage, agent2: V2XMessage) -> str:
         return "low"
 
 
+def agent_group(agent_id: str) -> int:
+    if agent_id.startswith("BG_"):
+        return GROUP_BG
+    if agent_id.startswith("AMBULANCE_"):
+        return GROUP_AMBULANCE
+    return GROUP_NORMAL
+
+
+def _kinematics(a: V2XMessage) -> tuple:
+    # (x, y, direction, vx, vy, time_to_intersection, moves_on_ns_axis, speed). Published messages
+    # are replaced, never mutated, so every vehicle's scan of the same state reuses one row.
+    row = a._kinematics
+    if row is None:
+        rad = math.radians(a.direction)
+        vx, vy = get_velocity_components(a.speed, a.direction)
+        row = a._kinematics = (
+            a.x, a.y, a.direction, vx, vy, time_to_intersection(a),
+            abs(math.cos(rad)) >= abs(math.sin(rad)), a.speed,
+        )
+    return row
+
+
+def _kinematics_rows(agents: List[V2XMessage]) -> np.ndarray:
+    return np.array([_kinematics(a) for a in agents], dtype=float).reshape(-1, 8)
+
+
+def _risk_codes(rows: np.ndarray, i: np.ndarray, j: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # assess_intersection_risk as RISK_LEVELS indices for agents i vs j; i and j are index
+    # arrays that broadcast together (a column/row pair for the full matrix, or flat pair lists).
+    # Per-agent trig stays on math.* (see _kinematics) so the codes match the scalar path exactly.
+    # Also returns the matching compute_ttc values, same shape as the codes.
+    x, y, d, vx, vy, t = rows[:, :6].T
+    ns = rows[:, 6] != 0.0
+
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    dist = np.sqrt(dx * dx + dy * dy)
+
+    same_axis = ns[i] == ns[j]
+    diff = np.abs(d[i] - d[j]) % 360
+    opposite = same_axis & (np.abs(diff - 180) < 10)
+    wrapped = np.where(diff > 180, 360 - diff, diff)
+    lateral = np.where(ns[i], np.abs(dx), np.abs(dy))
+    following = same_axis & (wrapped <= 30) & (lateral < 25.0)
+
+    rvx = vx[j] - vx[i]
+    rvy = vy[j] - vy[i]
+    rel_speed = np.sqrt(rvx * rvx + rvy * rvy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dot = (dx * rvx + dy * rvy) / dist
+        ttc = np.where((rel_speed < 0.1) | (dot >= 0), np.inf, dist / -dot)
+        ttc[dist < 1.0] = 0.0
+        delta_t = np.abs(t[i] - t[j])
+
+    near = dist < DANGER_ZONE_RADIUS
+    codes = np.select(
+        [
+            (ttc <= TTC_COLLISION) | ((delta_t < 2.0) & near),
+            (ttc <= TTC_HIGH) | ((delta_t < 4.0) & near),
+            (ttc <= TTC_MEDIUM) | (delta_t < 6.0),
+        ],
+        [3, 2, 1], 0,
+    ).astype(np.int8)
+    unreachable = ~np.isfinite(t)
+    codes[opposite | following | unreachable[i] | unreachable[j]] = 0
+    return codes, ttc
+
+
+def pairwise_risk(agents: List[V2XMessage]) -> np.ndarray:
+    # assess_intersection_risk for every (i, j) at once, as an N x N matrix of RISK_LEVELS indices
+    idx = np.arange(len(agents))
+    return _risk_codes(_kinematics_rows(agents), idx[:, None], idx[None, :])[0]
+
+
+def risky_pairs(agents: List[V2XMessage], groups: Optional[List[int]] = None,
+                with_ttc: bool = False) -> List[tuple]:
+    # (i, j, risk) for every i < j at high/collision risk, in nested-loop order; with_ttc
+    # appends compute_ttc(agents[i], agents[j]), taken from the vector math when available.
+    # With groups given, pairs inside one SAME_GROUP_SKIP group are dropped before any risk math.
+    # high/collision needs dist < DANGER_ZONE_RADIUS or ttc <= TTC_HIGH, and ttc is at least
+    # dist / (s1 + s2): pairs beyond both reaches are dropped exactly before the narrow phase.
+    n = len(agents)
+    if n < VECTOR_MIN_AGENTS:
+        pairs = []
+        for i in range(n):
+            a1 = agents[i]
+            g1 = groups[i] if groups is not None else GROUP_NORMAL
+            skip_group = g1 in SAME_GROUP_SKIP
+            for j in range(i + 1, n):
+                if skip_group and groups[j] == g1:
+                    continue
+                a2 = agents[j]
+                dx = a1.x - a2.x
+                dy = a1.y - a2.y
+                reach = max(DANGER_ZONE_RADIUS, TTC_HIGH * (abs(a1.speed) + abs(a2.speed))) + 1.0
+                if dx * dx + dy * dy > reach * reach:
+                    continue
+                risk = assess_intersection_risk(a1, a2)
+                if risk in ("high", "collision"):
+                    pairs.append((i, j, risk, compute_ttc(a1, a2)) if with_ttc else (i, j, risk))
+        return pairs
+
+    rows = _kinematics_rows(agents)
+    # broad phase over the upper triangle (row-major, so nested-loop order is kept)
+    iu, ju = np.triu_indices(n, 1)
+    x, y, s = rows[:, 0], rows[:, 1], np.abs(rows[:, 7])
+    dx = x[iu] - x[ju]
+    dy = y[iu] - y[ju]
+    reach = np.maximum(DANGER_ZONE_RADIUS, TTC_HIGH * (s[iu] + s[ju])) + 1.0
+    keep = dx * dx + dy * dy <= reach * reach
+    if groups is not None:
+        g = np.asarray(groups)
+        keep &= ~((g[iu] == g[ju]) & np.isin(g[iu], SAME_GROUP_SKIP))
+    iu, ju = iu[keep], ju[keep]
+
+    codes, ttc = _risk_codes(rows, iu, ju)
+    hit = codes >= 2
+    iu, ju, codes = iu[hit].tolist(), ju[hit].tolist(), codes[hit].tolist()
+    if with_ttc:
+        return [(i, j, RISK_LEVELS[c], t) for i, j, c, t in zip(iu, ju, codes, ttc[hit].tolist())]
+    return [(i, j, RISK_LEVELS[c]) for i, j, c in zip(iu, ju, codes)]
+
+
 def compute_risk_for_agent(my_agent: V2XMessage, others: Dict[str, V2XMessage]) -> str:
     if not others:
         return "low"
@@ -143,21 +284,52 @@ def compute_risk_for_agent(my_agent: V2XMessage, others: Dict[str, V2XMessage])
     return max_risk
 
 
-def get_collision_pairs(all_agents: Dict[str, V2XMessage]) -> list:
-    agents = list(all_agents.values())
-    pairs = []
+def _pair_dict(a1: V2XMessage, a2: V2XMessage, risk: str, ttc: float) -> dict:
+    return {
+        "agent1": a1.agent_id,
+        "agent2": a2.agent_id,
+        "risk": risk,
+        "ttc": round(ttc, 2),
+    }
 
-    for i in range(len(agents)):
-        for j in range(i + 1, len(agents)):
-            a1 = agents[i]
-            a2 = agents[j]
-            risk = assess_intersection_risk(a1, a2)
-            if risk in ("high", "collision"):
-                pairs.append({
-                    "agent1": a1.agent_id,
-                    "agent2": a2.agent_id,
-                    "risk": risk,
-                    "ttc": round(compute_ttc(a1, a2), 2),
-                })
-
-    return pairs
+
+def get_collision_pairs(all_agents: Dict[str, V2XMessage], skip_same_group: bool = False) -> list:
+    agents = list(all_agents.values())
+    groups = [agent_group(a.agent_id) for a in agents] if skip_same_group else None
+    return [
+        _pair_dict(agents[i], agents[j], risk, ttc)
+        for i, j, risk, ttc in risky_pairs(agents, groups, with_ttc=True)
+    ]
+
+
+_pairs_cache: Tuple[int, float, list, list] = (-1, 0.0, [], [])
+
+
+def get_collision_pairs_cached(skip_same_group: bool = False,
+                               snapshot: Optional[Tuple[int, Dict[str, V2XMessage]]] = None,
+                               max_age: float = 0.0) -> list:
+    """get_collision_pairs over the live channel, recomputed only when channel.version moves.
+
+    One scan fills both the full and the group-filtered list. Pass a (version, states)
+    pair from channel.get_snapshot() to reuse states the caller already holds, and
+    max_age > 0 to accept a result up to that many seconds old even if the channel
+    moved on. The returned list is shared between callers and must not be mutated.
+    """
+    global _pairs_cache
+    version = channel.version if snapshot is None else snapshot[0]
+    cached_version, computed_at, all_pairs, mixed_pairs = _pairs_cache
+    now = time.monotonic()
+    if cached_version != version and now - computed_at >= max_age:
+        # states read after the version, so a racing publish only causes one extra recompute
+        states = channel.get_all_states() if snapshot is None else snapshot[1]
+        agents = list(states.values())
+        groups = [agent_group(a.agent_id) for a in agents]
+        all_pairs, mixed_pairs = [], []
+        for i, j, risk, ttc in risky_pairs(agents, with_ttc=True):
+            pair = _pair_dict(agents[i], agents[j], risk, ttc)
+            all_pairs.append(pair)
+            g = groups[i]
+            if g != groups[j] or g not in SAME_GROUP_SKIP:
+                mixed_pairs.append(pair)
+        _pairs_cache = (version, now, all_pairs, mixed_pairs)
+    return mixed_pairs if skip_same_group else all_pairs
@@ -2,9 +2,9 @@
 import time
 import threading
 import math
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from v2x_channel import V2XMessage, channel
-from collision_detector import distance, INTERSECTION_CENTER, get_collision_pairs
+from collision_detector import distance_sq, INTERSECTION_CENTER, get_collision_pairs
 
 UPDATE_INTERVAL = 0.1
 DECELERATION = 4.0
@@ -14,6 +14,11 @@ EMERGENCY_PHASE = 15.0
 STOP_LINE_DIST = 25.0
 SLOW_ZONE_DIST = 50.0
 APPROACH_DIST = 100.0
+CLEAR_DIST = 5.0
+
+SLOW_ZONE_DIST_SQ = SLOW_ZONE_DIST ** 2
+APPROACH_DIST_SQ = APPROACH_DIST ** 2
+CLEAR_DIST_SQ = CLEAR_DIST ** 2
 
 
 def get_movement_axis(agent: V2XMessage) -> str:
@@ -27,12 +32,42 @@ def stopping_distance(speed: float) -> float:
     return (speed ** 2) / (2 * DECELERATION) if speed > 0 else 0.0
 
 
+def _green_recommendation(dist_sq: float, speed: float, time_remaining: float) -> Tuple[float, str]:
+    if dist_sq <= SLOW_ZONE_DIST_SQ:
+        return min(speed, 8.0), "slow_in_intersection"
+    dist = math.sqrt(dist_sq)
+    time_to_arrive = dist / speed if speed > 0.1 else float('inf')
+    if time_to_arrive <= time_remaining:
+        return min(speed, MAX_SPEED), "maintain_speed_green"
+    next_green_in = time_remaining + PHASE_DURATION
+    if next_green_in <= 0:
+        return speed, "adjust_for_next_green"
+    return max(2.0, min(dist / next_green_in, MAX_SPEED)), "adjust_for_next_green"
+
+
+def _red_recommendation(dist_sq: float, speed: float, time_to_next_green: float) -> Tuple[float, str]:
+    if dist_sq <= (stopping_distance(speed) + STOP_LINE_DIST) ** 2:
+        return 0.0, "stop_red_light"
+    if dist_sq <= APPROACH_DIST_SQ:
+        target_speed = math.sqrt(dist_sq) / time_to_next_green if time_to_next_green > 0 else 0.0
+        return max(0.0, min(target_speed, speed * 0.75)), "decelerate_for_red"
+    return speed, "prepare_to_stop"
+
+
 class InfrastructureAgent:
 
     def __init__(self):
         self.agent_id = "INFRA_TL_01"
+        self._running = False
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        """Back to a fresh NS_GREEN cycle with zeroed stats, so one instance can be reused."""
+        self._join_previous()
         self.phase = "NS_GREEN"
         self.phase_timer = 0.0
+        self._phase_started_at = time.monotonic()
         self.phase_duration = PHASE_DURATION
         self.emergency_mode = False
         self.emergency_axis = None
@@ -46,10 +81,10 @@ class InfrastructureAgent:
             "uptime": 0.0,
         }
 
-        self._tracked_vehicles: Dict[str, float] = {}
+        self._tracked_vehicles: Dict[str, int] = {}
+        self._tick = 0
         self._prev_collision_pairs = set()
-        self._running = False
-        self._thread = None
+        self._pairs_fingerprint = None
         self._start_time = None
 
     def _get_green_axis(self) -> str:
@@ -64,8 +99,7 @@ class InfrastructureAgent:
         for agent in all_states.values():
             if agent.agent_type != "vehicle" or not agent.is_emergency:
                 continue
-            dist = distance(agent.x, agent.y, *INTERSECTION_CENTER)
-            if dist < APPROACH_DIST:
+            if distance_sq(agent.x, agent.y, *INTERSECTION_CENTER) < APPROACH_DIST_SQ:
                 return get_movement_axis(agent)
         return None
 
@@ -81,7 +115,9 @@ class InfrastructureAgent:
                 return True
         return False
 
-    def _update_phase(self, all_states: Dict[str, V2XMessage]):
+    def _update_phase(self, all_states: Dict[str, V2XMessage], now: Optional[float] = None):
+        if now is None:
+            now = time.monotonic()
         emergency_axis = self._detect_emergency(all_states)
 
         if emergency_axis:
@@ -89,6 +125,7 @@ class InfrastructureAgent:
                 self.emergency_mode = True
                 self.emergency_axis = emergency_axis
                 self.phase_timer = 0.0
+                self._phase_started_at = now
                 self.phase_duration = EMERGENCY_PHASE
                 self.stats["emergency_preemptions"] += 1
 
@@ -103,103 +140,84 @@ class InfrastructureAgent:
                 self.emergency_mode = False
                 self.emergency_axis = None
                 self.phase_duration = PHASE_DURATION
-                self.phase_timer = 0.0
+                self._phase_started_at = now
 
-            self.phase_timer += UPDATE_INTERVAL
+            self.phase_timer = now - self._phase_started_at
             if self.phase_timer >= self.phase_duration:
                 if self.phase_timer < self.phase_duration + 5.0 and self._vehicles_in_intersection(all_states):
                     return
                 self.phase_timer = 0.0
+                self._phase_started_at = now
                 self.phase = "EW_GREEN" if self.phase == "NS_GREEN" else "NS_GREEN"
                 self.stats["phase_changes"] += 1
 
     def _compute_recommendations(self, all_states: Dict[str, V2XMessage]):
+        # fresh dicts every tick, swapped in whole: get_state() hands them to other threads
         recommendations = {}
+        green_axis = self._get_green_axis()
+        time_remaining = self.phase_duration - self.phase_timer
+        time_to_next_green = time_remaining + PHASE_DURATION
+        red_time_to_green = round(time_to_next_green, 1)
+        cx, cy = INTERSECTION_CENTER
 
         for agent_id, agent in all_states.items():
             if agent.agent_type != "vehicle":
                 continue
 
-            dist = distance(agent.x, agent.y, *INTERSECTION_CENTER)
-
-            if dist < 5.0:
-                recommendations[agent_id] = {
-                    "recommended_speed": min(agent.speed, MAX_SPEED),
-                    "action": "clear_intersection",
-                    "signal": "GREEN",
-                    "time_to_green": 0.0,
-                }
-                continue
+            dist_sq = distance_sq(agent.x, agent.y, cx, cy)
 
-            green_for_agent = self._is_green_for(agent)
-            time_remaining = self.phase_duration - self.phase_timer
-
-            if green_for_agent:
-                if dist > SLOW_ZONE_DIST:
-                    time_to_arrive = dist / agent.speed if agent.speed > 0.1 else float('inf')
-                    if time_to_arrive <= time_remaining:
-                        rec_speed = min(agent.speed, MAX_SPEED)
-                        action = "maintain_speed_green"
-                    else:
-                        next_green_in = time_remaining + PHASE_DURATION
-                        rec_speed = max(2.0, min(dist / next_green_in, MAX_SPEED)) if next_green_in > 0 else agent.speed
-                        action = "adjust_for_next_green"
-                else:
-                    rec_speed = min(agent.speed, 8.0)
-                    action = "slow_in_intersection"
-
-                recommendations[agent_id] = {
-                    "recommended_speed": round(rec_speed, 1),
-                    "action": action,
-                    "signal": "GREEN",
-                    "time_to_green": 0.0,
-                }
+            if dist_sq < CLEAR_DIST_SQ:
+                rec_speed, action, signal, time_to_green = (
+                    min(agent.speed, MAX_SPEED), "clear_intersection", "GREEN", 0.0)
+            elif agent.is_emergency:
+                rec_speed, action, signal, time_to_green = MAX_SPEED, "emergency_override", "GREEN", 0.0
+            elif get_movement_axis(agent) == green_axis:
+                rec_speed, action = _green_recommendation(dist_sq, agent.speed, time_remaining)
+                rec_speed, signal, time_to_green = round(rec_speed, 1), "GREEN", 0.0
             else:
-                stop_dist = stopping_distance(agent.speed)
-                time_to_next_green = time_remaining + PHASE_DURATION
-
-                if dist <= stop_dist + STOP_LINE_DIST:
-                    rec_speed = 0.0
-                    action = "stop_red_light"
-                elif dist <= APPROACH_DIST:
-                    target_speed = dist / time_to_next_green if time_to_next_green > 0 else 0.0
-                    rec_speed = max(0.0, min(target_speed, agent.speed * 0.75))
-                    action = "decelerate_for_red"
-                else:
-                    rec_speed = agent.speed
-                    action = "prepare_to_stop"
-
-                recommendations[agent_id] = {
-                    "recommended_speed": round(rec_speed, 1),
-                    "action": action,
-                    "signal": "RED",
-                    "time_to_green": round(time_to_next_green, 1),
-                }
-
-            if agent.is_emergency:
-                recommendations[agent_id] = {
-                    "recommended_speed": MAX_SPEED,
-                    "action": "emergency_override",
-                    "signal": "GREEN",
-                    "time_to_green": 0.0,
-                }
+                rec_speed, action = _red_recommendation(dist_sq, agent.speed, time_to_next_green)
+                rec_speed, signal, time_to_green = round(rec_speed, 1), "RED", red_time_to_green
+
+            recommendations[agent_id] = {
+                "recommended_speed": rec_speed,
+                "action": action,
+                "signal": signal,
+                "time_to_green": time_to_green,
+            }
 
         self.recommendations = recommendations
 
     def _update_stats(self, all_states: Dict[str, V2XMessage]):
-        vehicle_ids = {k for k, v in all_states.items() if v.agent_type == "vehicle"}
+        self._tick += 1
+        tick = self._tick
+        tracked = self._tracked_vehicles
 
-        for vid in vehicle_ids:
-            if vid not in self._tracked_vehicles:
-                self._tracked_vehicles[vid] = time.time()
+        for vid, agent in all_states.items():
+            if agent.agent_type != "vehicle":
+                continue
+            if vid not in tracked:
                 self.stats["vehicles_processed"] += 1
+            tracked[vid] = tick
 
-        exited = set(self._tracked_vehicles) - vehicle_ids
-        for vid in exited:
-            del self._tracked_vehicles[vid]
+        if any(t != tick for t in tracked.values()):
+            for vid in [k for k, t in tracked.items() if t != tick]:
+                del tracked[vid]
 
-        pairs = get_collision_pairs(all_states)
-        current_risks = {(p["agent1"], p["agent2"]) for p in pairs if p["risk"] == "collision"}
+        if len(tracked) < 2:
+            current_risks = set()
+            self._pairs_fingerprint = None
+        else:
+            fingerprint = tuple(
+                (vid, round(agent.x), round(agent.y), round(agent.speed, 1), round(agent.direction))
+                for vid, agent in all_states.items()
+                if agent.agent_type == "vehicle"
+            )
+            if fingerprint == self._pairs_fingerprint:
+                current_risks = self._prev_collision_pairs
+            else:
+                self._pairs_fingerprint = fingerprint
+                pairs = get_collision_pairs(all_states)
+                current_risks = {(p["agent1"], p["agent2"]) for p in pairs if p["risk"] == "collision"}
 
         for pair in self._prev_collision_pairs:
             if pair not in current_risks:
@@ -224,17 +242,32 @@ class InfrastructureAgent:
         ))
 
     def _run_loop(self):
+        next_deadline = time.monotonic()
         while self._running:
+            now = time.monotonic()
             all_states = channel.get_all_states()
-            self._update_phase(all_states)
+            self._update_phase(all_states, now)
             self._compute_recommendations(all_states)
             self._update_stats(all_states)
             self._publish()
-            time.sleep(UPDATE_INTERVAL)
+
+            next_deadline += UPDATE_INTERVAL
+            delay = next_deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline = time.monotonic()
+
+    def _join_previous(self):
+        # a stopped loop is at most one tick from noticing _running=False
+        if not self._running and self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=UPDATE_INTERVAL * 2)
 
     def start(self):
+        self._join_previous()
         self._running = True
         self._start_time = time.time()
+        self._phase_started_at = time.monotonic()
         self._thread = threading.Thread(target=self._run_loop, daemon=True)
         self._thread.start()
 
@@ -38,6 +38,7 @@ class IntersectionCoordinator:
     def __init__(self, intersections: List[Tuple[float, float]], grid_spacing: float):
         self._lock = threading.Lock()
         self._global_time = 0.0
+        self._epoch = time.monotonic()
         self._lights: Dict[Tuple[float, float], CoordinatedTrafficLight] = {}
         self._running = False
         self._thread: Optional[threading.Thread] = None
@@ -64,6 +65,7 @@ class IntersectionCoordinator:
         if self._running:
             return
         self._running = True
+        self._epoch = time.monotonic() - self._global_time
         self._thread = threading.Thread(target=self._update_loop, daemon=True)
         self._thread.start()
         logger.info("IntersectionCoordinator started")
@@ -74,12 +76,19 @@ class IntersectionCoordinator:
 
     def _update_loop(self):
         dt = 0.2
+        next_deadline = time.monotonic()
         while self._running:
             with self._lock:
-                self._global_time += dt
+                self._global_time = time.monotonic() - self._epoch
                 for light in self._lights.values():
                     light.update_from_global(self._global_time)
-            time.sleep(dt)
+
+            next_deadline += dt
+            delay = next_deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline = time.monotonic()
 
     def get_phase(self, x: float, y: float) -> Optional[str]:
         with self._lock:
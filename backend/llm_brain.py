@@ -1,11 +1,26 @@
 
 import os
 import json
+import hashlib
+import random
 import time
+import asyncio
 import threading
 import logging
-from collections import deque
-from typing import Dict, Optional, Any, List
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional, Any, List, Tuple
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
 
 logger = logging.getLogger("llm_brain")
 
@@ -14,15 +29,127 @@ LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 LLM_CALL_INTERVAL = float(os.getenv("LLM_CALL_INTERVAL", "0.6"))
 LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "4.0"))
+LLM_BATCH_TIMEOUT = float(os.getenv("LLM_BATCH_TIMEOUT", str(LLM_TIMEOUT * 1.5)))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "300"))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "16"))
+LLM_BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW", "0.05"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "48"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "2.0"))
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.2"))
+LLM_STREAM = os.getenv("LLM_STREAM", "true").lower() == "true"
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "false").lower() == "true"
+LLM_PROMPT_CACHE_TTL = int(os.getenv("LLM_PROMPT_CACHE_TTL", "3600"))
 
 _client = None
 _client_lock = threading.Lock()
 _client_init_attempted = False
 
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["go", "yield", "brake", "stop"]},
+        "speed": {"type": "number"},
+        "reason": {"type": "string"},
+    },
+    "required": ["action", "speed", "reason"],
+}
+
+BATCH_DECISION_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"agent_id": {"type": "string"}, **DECISION_SCHEMA["properties"]},
+        "required": ["agent_id", *DECISION_SCHEMA["required"]],
+    },
+}
+
+_GEN_CFG = None
+_batch_configs: Dict[int, Any] = {}
+_prompt_cache_name: Optional[str] = None
+_prompt_cache_expires = 0.0
+
+
+def _build_config(max_tokens: int, schema: dict):
+    from google.genai import types
+
+    if _prompt_cache_name:
+        prompt = {"cached_content": _prompt_cache_name}
+    else:
+        prompt = {"system_instruction": SYSTEM_PROMPT}
+    return types.GenerateContentConfig(
+        **prompt,
+        max_output_tokens=max_tokens,
+        temperature=0.15,
+        response_mime_type="application/json",
+        response_schema=schema,
+    )
+
+
+def _config_for(rows: int):
+    global _GEN_CFG
+    if rows <= 1:
+        if _GEN_CFG is None:
+            _GEN_CFG = _build_config(LLM_MAX_TOKENS, DECISION_SCHEMA)
+        return _GEN_CFG
+    cfg = _batch_configs.get(rows)
+    if cfg is None:
+        cfg = _batch_configs[rows] = _build_config(LLM_MAX_TOKENS * rows, BATCH_DECISION_SCHEMA)
+    return cfg
+
+
+def _build_http_options():
+    # one pooled keep-alive transport for every batcher call; HTTP/2 when the optional h2 is installed
+    from google.genai import types
+    timeout = int(LLM_TIMEOUT * 1000)
+    # httpx_async_client only exists in newer SDKs and HttpOptions rejects unknown fields
+    if "httpx_async_client" not in getattr(types.HttpOptions, "model_fields", {}):
+        logger.info("google-genai has no httpx_async_client option; using the SDK's own transport")
+        return types.HttpOptions(timeout=timeout)
+    import importlib.util
+    import httpx
+    http2 = importlib.util.find_spec("h2") is not None
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONCURRENCY,
+        max_keepalive_connections=LLM_MAX_CONCURRENCY,
+    )
+    return types.HttpOptions(
+        httpx_async_client=httpx.AsyncClient(limits=limits, http2=http2),
+        timeout=timeout,
+    )
+
+
+def _set_prompt_cache(name: Optional[str], expires: float):
+    global _prompt_cache_name, _prompt_cache_expires, _GEN_CFG
+    _prompt_cache_name = name
+    _prompt_cache_expires = expires
+    _GEN_CFG = None
+    _batch_configs.clear()
+
+
+async def _refresh_prompt_cache(client):
+    from google.genai import types
+
+    try:
+        cache = await client.aio.caches.create(
+            model=LLM_MODEL,
+            config=types.CreateCachedContentConfig(
+                system_instruction=SYSTEM_PROMPT, ttl=f"{LLM_PROMPT_CACHE_TTL}s",
+                # names which prompt revision a cache entry holds when listing caches
+                display_name=f"v2x-system-{SYSTEM_PROMPT_HASH}",
+            ),
+        )
+        _set_prompt_cache(cache.name, time.time() + LLM_PROMPT_CACHE_TTL)
+        logger.info(f"System prompt cached as {cache.name}")
+    except Exception as e:
+        # too short for the model's caching minimum, or caching unsupported: send it inline
+        _set_prompt_cache(None, time.time() + LLM_PROMPT_CACHE_TTL)
+        logger.warning(f"Prompt caching unavailable, sending system prompt inline: {e}")
+
 
 def _get_client():
-    global _client, _client_init_attempted
+    global _client, _client_init_attempted, _GEN_CFG
     if _client is not None:
         return _client
     if _client_init_attempted:
@@ -38,7 +165,8 @@ def _get_client():
             return None
         try:
             from google import genai
-            _client = genai.Client(api_key=GEMINI_API_KEY)
+            _client = genai.Client(api_key=GEMINI_API_KEY, http_options=_build_http_options())
+            _GEN_CFG = _build_config(LLM_MAX_TOKENS, DECISION_SCHEMA)
             logger.info(f"Google Gemini client initialized (model={LLM_MODEL})")
             return _client
         except Exception as e:
@@ -63,7 +191,7 @@ class CircuitBreaker:
         self._cooldown = cooldown_seconds
 
         self._state = self.CLOSED
-        self._failures: list = []
+        self._failures: deque = deque(maxlen=max(1, failure_threshold) * 4)
         self._successes: int = 0
         self._last_failure_time: float = 0.0
         self._opened_at: float = 0.0
@@ -72,20 +200,20 @@ class CircuitBreaker:
 
     @property
     def state(self) -> str:
+        # attribute reads are atomic; only the OPEN -> HALF_OPEN transition needs the lock
+        state = self._state
+        if state != self.OPEN or time.time() - self._opened_at < self._cooldown:
+            return state
         with self._lock:
-            if self._state == self.OPEN:
-                if time.time() - self._opened_at >= self._cooldown:
-                    self._state = self.HALF_OPEN
-                    logger.info("[CircuitBreaker] HALF_OPEN — testing one LLM call")
+            if self._state == self.OPEN and time.time() - self._opened_at >= self._cooldown:
+                self._state = self.HALF_OPEN
+                logger.info("[CircuitBreaker] HALF_OPEN — testing one LLM call")
             return self._state
 
     def allow_request(self) -> bool:
-        s = self.state
-        if s == self.CLOSED:
-            return True
-        if s == self.HALF_OPEN:
+        if self._state == self.CLOSED:
             return True
-        return False
+        return self.state != self.OPEN
 
     def record_success(self):
         with self._lock:
@@ -99,8 +227,10 @@ class CircuitBreaker:
         now = time.time()
         with self._lock:
             self._last_failure_time = now
-            self._failures = [t for t in self._failures if now - t < self._window]
-            self._failures.append(now)
+            failures = self._failures
+            while failures and now - failures[0] >= self._window:
+                failures.popleft()
+            failures.append(now)
 
             if self._state == self.HALF_OPEN:
                 self._state = self.OPEN
@@ -118,15 +248,15 @@ class CircuitBreaker:
                     )
 
     def get_stats(self) -> dict:
-        with self._lock:
-            return {
-                "circuit_state": self._state,
-                "recent_failures": len(self._failures),
-                "failure_threshold": self._threshold,
-                "total_successes": self._successes,
-                "total_circuit_trips": self._total_trips,
-                "cooldown_seconds": self._cooldown,
-            }
+        # monitoring snapshot; plain attribute reads, no lock
+        return {
+            "circuit_state": self._state,
+            "recent_failures": len(self._failures),
+            "failure_threshold": self._threshold,
+            "total_successes": self._successes,
+            "total_circuit_trips": self._total_trips,
+            "cooldown_seconds": self._cooldown,
+        }
 
     def reset(self):
         with self._lock:
@@ -148,6 +278,10 @@ def get_circuit_breaker_stats() -> dict:
     return _circuit_breaker.get_stats()
 
 
+NEAR_MISS_INTERVAL = 2.0
+NEAR_MISS_TTC = 4.0
+
+
 class AgentMemory:
 
     def __init__(self, agent_id: str, max_decisions: int = 20, max_events: int = 10):
@@ -156,6 +290,8 @@ class AgentMemory:
         self._near_misses: deque = deque(maxlen=max_events)
         self._v2x_alerts: deque = deque(maxlen=max_events)
         self._lessons: deque = deque(maxlen=5)
+        self._lesson_set: set = set()
+        self._last_nm: Dict[str, float] = {}
         self._total_stops = 0
         self._total_yields = 0
         self._total_brakes = 0
@@ -163,6 +299,8 @@ class AgentMemory:
         self._last_action = None
         self._time_waiting = 0.0
         self._wait_start: Optional[float] = None
+        self._ctx_cache: Optional[str] = None
+        self._ctx_valid_until = 0.0
 
     def record_decision(self, situation: str, decision: Dict[str, Any]):
         entry = {
@@ -174,6 +312,7 @@ class AgentMemory:
             "reason": decision["reason"],
         }
         self._decisions.append(entry)
+        self._ctx_cache = None
 
         if decision["action"] == self._last_action:
             self._consecutive_same_action += 1
@@ -197,17 +336,39 @@ class AgentMemory:
                 self._wait_start = None
 
     def record_near_miss(self, other_id: str, ttc: float, risk: str):
+        now = time.time()
+        if now - self._last_nm.get(other_id, 0.0) < NEAR_MISS_INTERVAL:
+            return
+        if len(self._last_nm) >= 32:
+            self._last_nm = {
+                k: t for k, t in self._last_nm.items() if now - t < NEAR_MISS_INTERVAL
+            }
+        self._last_nm[other_id] = now
+        self._ctx_cache = None
         self._near_misses.append({
-            "time": time.time(),
+            "time": now,
             "other_vehicle": other_id,
             "ttc": ttc,
             "risk_level": risk,
         })
         lesson = f"Near-miss with {other_id} (TTC={ttc:.1f}s) — be more cautious approaching"
-        if lesson not in list(self._lessons):
-            self._lessons.append(lesson)
+        if lesson not in self._lesson_set:
+            self._append_lesson(lesson)
+
+    def _append_lesson(self, lesson: str):
+        if len(self._lessons) == self._lessons.maxlen:
+            self._lesson_set.discard(self._lessons[0])
+        self._lessons.append(lesson)
+        self._lesson_set.add(lesson)
+
+    def record_near_misses(self, others: list, risk: str):
+        for o in others:
+            ttc = entry_ttc(o)
+            if ttc < NEAR_MISS_TTC:
+                self.record_near_miss(o["id"], ttc, risk)
 
     def record_v2x_alert(self, from_id: str, alert_type: str, message: str):
+        self._ctx_cache = None
         self._v2x_alerts.append({
             "time": time.time(),
             "from": from_id,
@@ -216,7 +377,12 @@ class AgentMemory:
         })
 
     def get_memory_context(self) -> str:
+        now = time.time()
+        if self._ctx_cache is not None and now < self._ctx_valid_until:
+            return self._ctx_cache
+
         parts = []
+        valid_until = float("inf")
 
         if self._decisions:
             parts.append("MY RECENT DECISION HISTORY:")
@@ -235,7 +401,8 @@ class AgentMemory:
         if self._time_waiting > 0:
             wait = self._time_waiting
             if self._wait_start:
-                wait += time.time() - self._wait_start
+                wait += now - self._wait_start
+                valid_until = now
             stats_parts.append(f"time_waiting={wait:.1f}s")
         if self._consecutive_same_action > 3:
             stats_parts.append(
@@ -252,8 +419,9 @@ class AgentMemory:
                     f"(TTC={nm['ttc']:.1f}s, risk={nm['risk_level']})"
                 )
 
-        recent_alerts = [a for a in self._v2x_alerts if time.time() - a["time"] < 5.0]
+        recent_alerts = [a for a in self._v2x_alerts if now - a["time"] < 5.0]
         if recent_alerts:
+            valid_until = min(valid_until, recent_alerts[0]["time"] + 5.0)
             parts.append("V2X ALERTS RECEIVED:")
             for a in recent_alerts[-3:]:
                 parts.append(f"  - From {a['from']}: [{a['type']}] {a['message']}")
@@ -263,7 +431,9 @@ class AgentMemory:
             for lesson in self._lessons:
                 parts.append(f"  - {lesson}")
 
-        return "\n".join(parts) if parts else ""
+        self._ctx_cache = "\n".join(parts) if parts else ""
+        self._ctx_valid_until = valid_until
+        return self._ctx_cache
 
     def is_stuck(self) -> bool:
         if self._wait_start and (time.time() - self._wait_start) > 10.0:
@@ -293,6 +463,8 @@ class AgentMemory:
         self._near_misses.clear()
         self._v2x_alerts.clear()
         self._lessons.clear()
+        self._lesson_set.clear()
+        self._last_nm.clear()
         self._total_stops = 0
         self._total_yields = 0
         self._total_brakes = 0
@@ -300,6 +472,7 @@ class AgentMemory:
         self._last_action = None
         self._time_waiting = 0.0
         self._wait_start = None
+        self._ctx_cache = None
 
 
 SYSTEM_PROMPT = """You are an autonomous AI driving agent controlling a single vehicle in a V2X (Vehicle-to-Everything) intersection simulation.
@@ -357,6 +530,23 @@ You MUST respond ONLY with a valid JSON object (no markdown, no explanation):
 """
 
 
+SYSTEM_PROMPT_HASH = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
+def _format_other(o: dict) -> str:
+    line = (
+        f"  - {o['id']}: pos=({o['x']:.1f},{o['y']:.1f}), speed={o['speed']:.1f} m/s, "
+        f"heading={o['direction']}\u00b0, intention={o['intention']}, "
+        f"emergency={o.get('is_emergency', False)}, "
+        f"distance_to_me={o.get('dist', 0):.1f}, "
+        f"ttc={o.get('ttc', 'inf')}, "
+        f"their_decision={o.get('decision', 'unknown')}"
+    )
+    if o.get('ahead_in_my_lane'):
+        line += f", AHEAD_IN_MY_LANE=YES, gap={o.get('gap', '?')}m"
+    return line
+
+
 def build_situation_prompt(
     agent_id: str,
     x: float, y: float,
@@ -387,18 +577,7 @@ def build_situation_prompt(
 
     if others:
         parts.append(f"\nNEARBY VEHICLES ({len(others)}):")
-        for o in others:
-            line = (
-                f"  - {o['id']}: pos=({o['x']:.1f},{o['y']:.1f}), speed={o['speed']:.1f} m/s, "
-                f"heading={o['direction']}\u00b0, intention={o['intention']}, "
-                f"emergency={o.get('is_emergency', False)}, "
-                f"distance_to_me={o.get('dist', 0):.1f}, "
-                f"ttc={o.get('ttc', 'inf')}, "
-                f"their_decision={o.get('decision', 'unknown')}"
-            )
-            if o.get('ahead_in_my_lane'):
-                line += f", AHEAD_IN_MY_LANE=YES, gap={o.get('gap', '?')}m"
-            parts.append(line)
+        parts.append("\n".join(_format_other(o) for o in others))
     else:
         parts.append("\nNo other vehicles detected nearby.")
 
@@ -412,13 +591,356 @@ def build_situation_prompt(
     return "\n".join(parts)
 
 
+BATCH_INSTRUCTION = """Decide for EACH vehicle below. Every row is the situation of one vehicle, written from its own point of view.
+Respond ONLY with a valid JSON array (no markdown, no explanation), one object per row:
+[{"agent_id": "<row agent_id>", "action": "go" | "yield" | "brake" | "stop", "speed": <float 0.0 to 25.0>, "reason": "<short reason string, max 30 chars>"}]
+
+VEHICLES:
+"""
+
+
+def json_value_end(text: str, state: list) -> int:
+    # state = [scanned, depth, in_string, escaped]; resumes where the last chunk stopped
+    i, depth, in_string, escaped = state
+    n = len(text)
+    while i < n:
+        c = text[i]
+        i += 1
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                state[:] = [i, depth, in_string, escaped]
+                return i
+    state[:] = [i, depth, in_string, escaped]
+    return -1
+
+
+async def _generate(client, contents: str, rows: int = 1) -> str:
+    if not LLM_STREAM:
+        response = await client.aio.models.generate_content(
+            model=LLM_MODEL,
+            contents=contents,
+            config=_config_for(rows),
+        )
+        return response.text
+
+    # stop reading as soon as the top-level JSON value closes
+    stream = await client.aio.models.generate_content_stream(
+        model=LLM_MODEL,
+        contents=contents,
+        config=_config_for(rows),
+    )
+    text = ""
+    state = [0, 0, False, False]
+    try:
+        async for chunk in stream:
+            text += chunk.text or ""
+            end = json_value_end(text, state)
+            if end >= 0:
+                return text[:end]
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return text
+
+
+def parse_batch_response(text: str) -> Dict[str, dict]:
+    rows = _loads(text)
+    if isinstance(rows, dict):
+        rows = [rows]
+    if not isinstance(rows, list):
+        return {}
+    return {
+        str(row["agent_id"]): row
+        for row in rows
+        if isinstance(row, dict) and "agent_id" in row
+    }
+
+
+def _is_retryable(exc: Exception) -> bool:
+    code = getattr(exc, "code", None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+class DecisionBatcher:
+    # Vehicle threads only touch submit(); everything else runs on the batcher's own
+    # loop and uses asyncio primitives, so no threading lock is taken on that loop.
+
+    def __init__(
+        self,
+        max_batch: int = LLM_BATCH_SIZE,
+        window: float = LLM_BATCH_WINDOW,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT,
+        batch_timeout: float = LLM_BATCH_TIMEOUT,
+        retry_attempts: int = LLM_RETRY_ATTEMPTS,
+    ):
+        self._max_batch = max(1, max_batch)
+        self._window = window
+        self._timeout = timeout
+        self._batch_timeout = batch_timeout
+        self._retry_attempts = max(1, retry_attempts)
+        self._max_concurrency = max(1, max_concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+        self._cache_refresh: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._batched_requests = 0
+        self._fallbacks = 0
+        self._retries = 0
+
+    def submit(self, agent_id: str, prompt: str) -> Future:
+        loop = self._ensure_started()
+        future: Future = Future()
+        loop.call_soon_threadsafe(self._queue.put_nowait, (agent_id, prompt, future))
+        return future
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                threading.Thread(
+                    target=self._run, args=(loop, ready), name="llm-batcher", daemon=True
+                ).start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    def _run(self, loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        loop.create_task(self._serve())
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    async def _collect(self) -> List[Tuple[str, str, Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self._window
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _serve(self):
+        while True:
+            batch = await self._collect()
+            task = asyncio.ensure_future(self._dispatch_safe(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch_safe(self, batch: List[Tuple[str, str, Future]]):
+        try:
+            await self._dispatch(batch)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _call(self, client, contents: str, rows: int, timeout: float) -> str:
+        # retries share the caller's timeout so _DECISION_WAIT still bounds the vehicle thread
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(
+                        _generate(client, contents, rows), timeout=deadline - loop.time()
+                    )
+            except Exception as e:
+                attempt += 1
+                delay = LLM_RETRY_BACKOFF * (2 ** (attempt - 1)) + random.random() * 0.1
+                if (attempt >= self._retry_attempts or not _is_retryable(e)
+                        or loop.time() + delay >= deadline):
+                    raise
+                self._retries += 1
+                await asyncio.sleep(delay)
+
+    def _maybe_refresh_prompt_cache(self, client):
+        # refreshed a minute before expiry; calls keep the current config meanwhile
+        if not LLM_PROMPT_CACHE or time.time() < _prompt_cache_expires - 60:
+            return
+        if self._cache_refresh is None or self._cache_refresh.done():
+            self._cache_refresh = asyncio.ensure_future(_refresh_prompt_cache(client))
+
+    async def _dispatch(self, batch: List[Tuple[str, str, Future]]):
+        client = _get_client()
+        if client is None:
+            for _, _, future in batch:
+                future.set_exception(RuntimeError("Gemini client unavailable"))
+            return
+
+        self._maybe_refresh_prompt_cache(client)
+
+        if len(batch) == 1:
+            await self._dispatch_single(client, *batch[0])
+            return
+
+        self._batches += 1
+        self._batched_requests += len(batch)
+        rows = [{"agent_id": agent_id, "situation": prompt} for agent_id, prompt, _ in batch]
+        try:
+            text = await self._call(
+                client, BATCH_INSTRUCTION + _dumps(rows),
+                rows=len(batch), timeout=self._batch_timeout,
+            )
+            decisions = parse_batch_response(text)
+        except Exception as e:
+            logger.warning(f"[Batcher] batch of {len(batch)} failed, falling back to single calls: {e}")
+            decisions = {}
+
+        singles = []
+        for agent_id, prompt, future in batch:
+            decision = decisions.get(agent_id)
+            if decision is not None:
+                future.set_result(decision)
+            else:
+                self._fallbacks += 1
+                singles.append(self._dispatch_single(client, agent_id, prompt, future))
+        if singles:
+            await asyncio.gather(*singles)
+
+    async def _dispatch_single(self, client, agent_id: str, prompt: str, future: Future):
+        try:
+            text = await self._call(client, prompt, rows=1, timeout=self._timeout)
+            future.set_result(_loads(text))
+        except Exception as e:
+            future.set_exception(e)
+
+    def get_stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "batched_requests": self._batched_requests,
+            "single_fallbacks": self._fallbacks,
+            "retries": self._retries,
+        }
+
+
+_batcher = DecisionBatcher()
+# worst case: batch window, a timed-out batch call, then a single fallback call
+_DECISION_WAIT = LLM_BATCH_WINDOW + LLM_BATCH_TIMEOUT + LLM_TIMEOUT
+
+
+def get_batcher_stats() -> dict:
+    return {**_batcher.get_stats(), **_decision_cache.get_stats()}
+
+
+def entry_ttc(o: dict) -> float:
+    ttc = o.get("ttc_value")
+    if ttc is not None:
+        return ttc
+    ttc_str = o.get("ttc", "inf")
+    try:
+        return float(ttc_str.replace("s", "")) if isinstance(ttc_str, str) else float(ttc_str)
+    except (ValueError, AttributeError):
+        return float("inf")
+
+
+def situation_key(
+    x: float, y: float, speed: float, direction: float,
+    intention: str, is_emergency: bool, entered_intersection: bool,
+    traffic_light: Optional[str], others: list, risk_level: str,
+) -> tuple:
+    # shared across vehicles: everything the prompt decides on, bar the position noise
+    return (
+        round(x), round(y), int(speed), round(direction),
+        intention, bool(is_emergency), bool(entered_intersection),
+        traffic_light, tuple(sorted(o["id"] for o in others)), risk_level,
+    )
+
+
+class DecisionCache:
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, ttl: float = LLM_CACHE_TTL):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] > self._ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(entry[1])
+
+    def put(self, key: tuple, decision: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), dict(decision))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "cache_entries": len(self._entries),
+                "cache_hits": self._hits,
+                "cache_misses": self._misses,
+            }
+
+
+_decision_cache = DecisionCache()
+
+
+_INTERVAL_SCALE = {"collision": 0.3, "high": 0.3, "medium": 1.0, "low": 3.0}
+
+
+def effective_interval(risk_level: str, stuck: bool) -> float:
+    scale = _INTERVAL_SCALE.get(risk_level, 1.0)
+    if stuck:
+        scale = min(scale, 1.0)
+    return LLM_CALL_INTERVAL * scale
+
+
 class LLMBrain:
     def __init__(self, agent_id: str):
         self.agent_id = agent_id
         self._last_call_time = 0.0
+        self._last_standstill: Optional[tuple] = None
         self._last_decision: Optional[Dict[str, Any]] = None
         self._call_count = 0
         self._error_count = 0
+        self._summary = dict.fromkeys((
+            "llm_calls", "llm_errors", "memory_decisions",
+            "near_misses", "v2x_alerts_received", "lessons_learned",
+        ), 0)
 
         self.memory = AgentMemory(agent_id)
 
@@ -443,9 +965,18 @@ class LLMBrain:
             return self._last_decision
 
         now = time.time()
-        if now - self._last_call_time < LLM_CALL_INTERVAL:
+        stuck = self.memory.is_stuck()
+        if now - self._last_call_time < effective_interval(risk_level, stuck):
             return self._last_decision
 
+        # stopped with the same light and the same neighbours: nothing new to ask about
+        standstill = None
+        if speed < 0.1 and not stuck and risk_level in ("low", "medium"):
+            standstill = (traffic_light, frozenset(o["id"] for o in others))
+            if standstill == self._last_standstill and self._last_decision is not None:
+                return self._last_decision
+        self._last_standstill = standstill
+
         client = _get_client()
         if client is None:
             return None
@@ -460,14 +991,15 @@ class LLMBrain:
 
         memory_context = self.memory.get_memory_context()
 
-        for o in others:
-            ttc_str = o.get("ttc", "inf")
-            try:
-                ttc_val = float(ttc_str.replace("s", "")) if isinstance(ttc_str, str) else float(ttc_str)
-            except (ValueError, AttributeError):
-                ttc_val = float("inf")
-            if ttc_val < 4.0:
-                self.memory.record_near_miss(o["id"], ttc_val, risk_level)
+        cache_key = situation_key(
+            x, y, speed, direction, intention, is_emergency, entered_intersection,
+            traffic_light, others, risk_level,
+        )
+        cached = _decision_cache.get(cache_key)
+        if cached is not None:
+            self._last_decision = cached
+            self.memory.record_decision(situation_summary, cached)
+            return cached
 
         prompt = build_situation_prompt(
             agent_id=self.agent_id,
@@ -485,23 +1017,7 @@ class LLMBrain:
         )
 
         try:
-            from google.genai import types
-
-            response = client.models.generate_content(
-                model=LLM_MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction=SYSTEM_PROMPT,
-                    max_output_tokens=LLM_MAX_TOKENS,
-                    temperature=0.15,
-                ),
-            )
-
-            text = response.text.strip()
-            if text.startswith("```"):
-                text = text.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-
-            decision = json.loads(text)
+            decision = _batcher.submit(self.agent_id, prompt).result(timeout=_DECISION_WAIT)
 
             action = decision.get("action", "go")
             if action not in ("go", "yield", "brake", "stop"):
@@ -520,16 +1036,17 @@ class LLMBrain:
             self._last_decision = result
             self._call_count += 1
             _circuit_breaker.record_success()
+            _decision_cache.put(cache_key, result)
 
             self.memory.record_decision(situation_summary, result)
 
             logger.debug(f"[{self.agent_id}] LLM: {result}")
             return result
 
-        except json.JSONDecodeError as e:
+        except TimeoutError:
             self._error_count += 1
             _circuit_breaker.record_failure()
-            logger.warning(f"[{self.agent_id}] LLM JSON parse error: {e}")
+            logger.warning(f"[{self.agent_id}] LLM call timed out after {_DECISION_WAIT:.1f}s")
             return self._last_decision
         except Exception as e:
             self._error_count += 1
@@ -548,8 +1065,21 @@ class LLMBrain:
             **memory_stats,
         }
 
+    def get_summary(self) -> dict:
+        # per-frame counters for VehicleAgent.get_state; reuses one dict, no locks
+        summary = self._summary
+        memory = self.memory
+        summary["llm_calls"] = self._call_count
+        summary["llm_errors"] = self._error_count
+        summary["memory_decisions"] = len(memory._decisions)
+        summary["near_misses"] = len(memory._near_misses)
+        summary["v2x_alerts_received"] = len(memory._v2x_alerts)
+        summary["lessons_learned"] = len(memory._lessons)
+        return summary
+
     def reset(self):
         self._last_call_time = 0.0
+        self._last_standstill = None
         self._last_decision = None
         self._call_count = 0
         self._error_count = 0
@@ -1,16 +1,19 @@
 
-import sys, os, glob, importlib
+import sys, os
 sys.dont_write_bytecode = True
-for pyc in glob.glob(os.path.join(os.path.dirname(__file__), "__pycache__", "*.pyc")):
-    try:
-        os.remove(pyc)
-    except Exception:
-        pass
-importlib.invalidate_caches()
+if os.getenv("CLEAN_PYCACHE"):
+    # one-shot dev cleanup of stale bytecode; off by default so restarts skip the sweep
+    import glob
+    for pyc in glob.glob(os.path.join(os.path.dirname(__file__), "__pycache__", "*.pyc")):
+        try:
+            os.remove(pyc)
+        except Exception:
+            pass
 
 from dotenv import load_dotenv
-load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
-load_dotenv()
+# repo-root .env first (wins on conflicts), then backend/.env; explicit paths skip find_dotenv's walk
+for _env in ("..", "."):
+    load_dotenv(os.path.join(os.path.dirname(__file__), _env, ".env"))
 
 import logging
 logging.basicConfig(
@@ -20,20 +23,54 @@ logging.basicConfig(
 logger = logging.getLogger("main")
 
 import asyncio
-from typing import Set, Optional
-from collections import defaultdict
+import hashlib
+import itertools
+import json
+import random
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, Set, Optional
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Header, Query, HTTPException, Request
+from fastapi import FastAPI, WebSocket, Depends, Header, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel
 
 from simulation import simulation
 from v2x_channel import channel
-from background_traffic import bg_traffic, get_grid_info
-from v2x_security import MAX_WS_CONNECTIONS, sanitize_full_state
+from agents import VehicleAgent
+from background_traffic import bg_traffic, get_grid_info, _build_route, _ALL_ROUTE_KEYS
+from llm_brain import (
+    LLM_ENABLED, LLM_MODEL, GEMINI_API_KEY, get_circuit_breaker_stats, get_batcher_stats,
+)
+from telemetry import telemetry
+
+try:
+    import orjson
+
+    def _encode_json(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    def _encode_json(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 API_TOKEN = os.getenv("API_TOKEN", "v2x-secret-token-change-in-prod")
 REST_RATE_LIMIT = int(os.getenv("REST_RATE_LIMIT", "30"))
+REST_RATE_LIMIT_MAX_IPS = int(os.getenv("REST_RATE_LIMIT_MAX_IPS", "100000"))
+REST_RATE_LIMIT_IDLE = 300.0
+# internal callers (health checks, the frontend host) that skip the REST limiter
+REST_RATE_LIMIT_EXEMPT = frozenset(
+    ip.strip() for ip in os.getenv("REST_RATE_LIMIT_EXEMPT", "").split(",") if ip.strip()
+)
 
 
 @asynccontextmanager
@@ -47,32 +84,58 @@ async def lifespan(app: FastAPI):
     logger.info("  NOTICE: Server MUST run with workers=1 (in-process state)")
     logger.info("  For horizontal scaling, replace SimulationManager with Redis.")
     logger.info("=" * 60)
+    broadcaster = asyncio.create_task(_broadcast_loop())
     yield
+    broadcaster.cancel()
     if simulation.running:
         simulation.stop()
     logger.info("V2X Safety Agent — shut down cleanly.")
 
 
-app = FastAPI(title="V2X Intersection Safety Agent", lifespan=lifespan)
+class _JSONResponse(Response):
+    # default REST encoder: orjson when available instead of stdlib json
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return _encode_json(content).encode()
+
+
+app = FastAPI(
+    title="V2X Intersection Safety Agent", lifespan=lifespan, default_response_class=_JSONResponse,
+)
 
 
 class _RestRateLimiter:
 
-    def __init__(self, max_per_min: int):
-        self._max = max_per_min
-        self._buckets: dict = defaultdict(list)
-        import threading
+    def __init__(self, max_per_min: int, max_ips: int = REST_RATE_LIMIT_MAX_IPS):
+        self._max = float(max_per_min)
+        self._rate = max_per_min / 60.0
+        self._max_ips = max(1, max_ips)
+        # token bucket per IP: [tokens, last_refill], least recently seen first
+        self._buckets: OrderedDict = OrderedDict()
         self._lock = threading.Lock()
 
     def allow(self, ip: str) -> bool:
-        import time as _t
-        now = _t.time()
+        now = time.monotonic()
         with self._lock:
-            bucket = self._buckets[ip]
-            self._buckets[ip] = [t for t in bucket if now - t < 60.0]
-            if len(self._buckets[ip]) >= self._max:
+            bucket = self._buckets.get(ip)
+            if bucket is None:
+                # idle IPs sit at the LRU front with a full bucket; dropping them changes nothing
+                while self._buckets:
+                    oldest = next(iter(self._buckets.values()))
+                    if now - oldest[1] < REST_RATE_LIMIT_IDLE:
+                        break
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[ip] = [self._max, now]
+                if len(self._buckets) > self._max_ips:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(ip)
+                bucket[0] = min(self._max, bucket[0] + (now - bucket[1]) * self._rate)
+                bucket[1] = now
+            if bucket[0] < 1.0:
                 return False
-            self._buckets[ip].append(now)
+            bucket[0] -= 1.0
             return True
 
 
@@ -90,7 +153,11 @@ async def verify_token(authorization: Optional[str] = Header(None)):
 
 
 async def rate_limit(request: Request):
+    # behind a proxy, uvicorn's proxy-headers middleware has already resolved X-Forwarded-For
+    # into request.client for peers in FORWARDED_ALLOW_IPS; the raw header is spoofable
     client_ip = request.client.host if request.client else "unknown"
+    if client_ip in REST_RATE_LIMIT_EXEMPT:
+        return
     if not _rest_limiter.allow(client_ip):
         raise HTTPException(status_code=429, detail="Too many requests. Try again later.")
 
@@ -103,73 +170,147 @@ app.add_middleware(
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
+# state / history JSON is large and compresses well; level 1 keeps the CPU cost low
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
 
-MAX_WS_CONNECTIONS = 10
-active_connections: Set[WebSocket] = set()
+MAX_WS_CONNECTIONS = int(os.getenv("MAX_WS_CONNECTIONS", "10"))
+WS_BROADCAST_INTERVAL = 0.05
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "2.0"))
+WS_QUEUE_SIZE = 1
+# with no agent publishing, only clocks/timers move; rebuild at this slower rate
+WS_IDLE_REFRESH = 1.0
+WS_DELTA_SNAPSHOT_EVERY = int(os.getenv("WS_DELTA_SNAPSHOT_EVERY", "100"))
+active_connections: Dict[WebSocket, asyncio.Queue] = {}
+_ws_slots = asyncio.Semaphore(MAX_WS_CONNECTIONS)
+_ws_formats: Dict[WebSocket, str] = {}
+# delta clients whose last snapshot/patch chain is intact
+_delta_synced: Set[asyncio.Queue] = set()
+# (queue, fmt) per client, rebuilt on connect/disconnect so the broadcaster
+# iterates it without copying; only touched from the event loop, so no lock needed
+_ws_targets: tuple = ()
 
 
-def sanitize_full_state(raw: dict) -> dict:
-    if not isinstance(raw, dict):
-        return {}
+def _refresh_ws_targets():
+    global _ws_targets
+    _ws_targets = tuple((q, _ws_formats[ws]) for ws, q in active_connections.items())
 
-    def _safe_str(val, mx=100):
-        return str(val)[:mx] if val is not None else ""
 
-    def _safe_num(val, lo=-10000, hi=10000):
-        try:
-            v = float(val)
-            return max(lo, min(hi, v))
-        except (TypeError, ValueError):
-            return 0
-
-    def _safe_agent(a):
-        if not isinstance(a, dict):
-            return a
-        return {
-            "agent_id": _safe_str(a.get("agent_id"), 30),
-            "agent_type": _safe_str(a.get("agent_type", "vehicle"), 20),
-            "x": _safe_num(a.get("x", 0)),
-            "y": _safe_num(a.get("y", 0)),
-            "speed": _safe_num(a.get("speed", 0), 0, 200),
-            "direction": _safe_num(a.get("direction", 0), 0, 360),
-            "intention": _safe_str(a.get("intention", "straight"), 20),
-            "risk_level": _safe_str(a.get("risk_level", "low"), 20),
-            "decision": _safe_str(a.get("decision", "go"), 20),
-            "reason": _safe_str(a.get("reason", ""), 50),
-            "is_emergency": bool(a.get("is_emergency", False)),
-            "is_police": bool(a.get("is_police", False)),
-            "is_drunk": bool(a.get("is_drunk", False)),
-            "pulling_over": bool(a.get("pulling_over", False)),
-            "arrested": bool(a.get("arrested", False)),
-            "llm_calls": int(a.get("llm_calls", 0)),
-            "llm_errors": int(a.get("llm_errors", 0)),
-            "memory_decisions": int(a.get("memory_decisions", 0)),
-            "near_misses": int(a.get("near_misses", 0)),
-            "v2x_alerts_received": int(a.get("v2x_alerts_received", 0)),
-            "lessons_learned": int(a.get("lessons_learned", 0)),
-        }
+def _drop_connection(ws: WebSocket):
+    queue = active_connections.pop(ws, None)
+    if queue is not None:
+        _ws_formats.pop(ws, None)
+        _delta_synced.discard(queue)
+        _refresh_ws_targets()
 
-    agents = {}
-    for k, v in raw.get("agents", {}).items():
-        agents[_safe_str(k, 30)] = _safe_agent(v)
 
-    pairs = []
-    for p in raw.get("collision_pairs", []):
-        pairs.append({
+def _safe_str(val, mx=100):
+    return str(val)[:mx] if val is not None else ""
+
+
+def _safe_num(val, lo=-10000, hi=10000, _float=float, _min=min, _max=max):
+    try:
+        return _max(lo, _min(hi, _float(val)))
+    except (TypeError, ValueError):
+        return 0
+
+
+_NUM_LO = np.array([-10000.0, -10000.0, 0.0, 0.0])
+_NUM_HI = np.array([10000.0, 10000.0, 200.0, 360.0])
+# cm for x/y/speed, 0.1 deg for heading: all the renderer uses, and ~half the digits on the wire
+_NUM_SCALE = np.array([100.0, 100.0, 100.0, 10.0])
+
+
+def _clamp_agent_numbers(agents: list, rounded: bool = False) -> Optional[list]:
+    # x, y, speed, direction for every agent in one clip; None sends the caller
+    # back to the per-value _safe_num path (non-numeric input)
+    rows = [(a.get("x", 0), a.get("y", 0), a.get("speed", 0), a.get("direction", 0)) for a in agents]
+    try:
+        cols = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    # numpy reads None as NaN, _safe_num maps it to 0
+    if np.isnan(cols).any() and any(None in r for r in rows):
+        return None
+    cols = np.where(np.isnan(cols), _NUM_HI, cols)
+    np.clip(cols, _NUM_LO, _NUM_HI, out=cols)
+    if rounded:
+        cols *= _NUM_SCALE
+        np.rint(cols, out=cols)
+        cols /= _NUM_SCALE
+    return cols.tolist()
+
+
+def _safe_agent(a, nums=None, rounded=False, _str=_safe_str, _num=_safe_num, _bool=bool, _int=int):
+    if not isinstance(a, dict):
+        return a
+    get = a.get
+    if nums is None:
+        nums = (
+            _num(get("x", 0)), _num(get("y", 0)),
+            _num(get("speed", 0), 0, 200), _num(get("direction", 0), 0, 360),
+        )
+        if rounded:
+            nums = (round(nums[0], 2), round(nums[1], 2), round(nums[2], 2), round(nums[3], 1))
+    x, y, speed, direction = nums
+    return {
+        "agent_id": _str(get("agent_id"), 30),
+        "agent_type": _str(get("agent_type", "vehicle"), 20),
+        "x": x,
+        "y": y,
+        "speed": speed,
+        "direction": direction,
+        "intention": _str(get("intention", "straight"), 20),
+        "risk_level": _str(get("risk_level", "low"), 20),
+        "decision": _str(get("decision", "go"), 20),
+        "reason": _str(get("reason", ""), 50),
+        "is_emergency": _bool(get("is_emergency", False)),
+        "is_police": _bool(get("is_police", False)),
+        "is_drunk": _bool(get("is_drunk", False)),
+        "pulling_over": _bool(get("pulling_over", False)),
+        "arrested": _bool(get("arrested", False)),
+        "llm_calls": _int(get("llm_calls", 0)),
+        "llm_errors": _int(get("llm_errors", 0)),
+        "memory_decisions": _int(get("memory_decisions", 0)),
+        "near_misses": _int(get("near_misses", 0)),
+        "v2x_alerts_received": _int(get("v2x_alerts_received", 0)),
+        "lessons_learned": _int(get("lessons_learned", 0)),
+    }
+
+
+def sanitize_full_state(raw: dict, rounded: bool = False) -> dict:
+    # rounded: WS view only; REST /simulation/state keeps full precision
+    if not isinstance(raw, dict):
+        return {}
+
+    agents_raw = raw.get("agents", {})
+    valid = [v for v in agents_raw.values() if isinstance(v, dict)]
+    nums = iter(_clamp_agent_numbers(valid, rounded) or ())
+    agents = {
+        _safe_str(k, 30): _safe_agent(v, next(nums, None), rounded) if isinstance(v, dict) else v
+        for k, v in agents_raw.items()
+    }
+
+    pairs = [
+        {
             "agent1": _safe_str(p.get("agent1"), 30),
             "agent2": _safe_str(p.get("agent2"), 30),
             "risk": _safe_str(p.get("risk", "low"), 20),
             "ttc": _safe_num(p.get("ttc", 999), 0, 9999),
-        })
+        }
+        for p in raw.get("collision_pairs", [])
+    ]
 
+    infra = raw.get("infrastructure") or {}
     return {
         "scenario": _safe_str(raw.get("scenario"), 50),
         "running": bool(raw.get("running", False)),
         "mode": _safe_str(raw.get("mode", "CITY"), 20),
         "agents": agents,
-        "infrastructure": raw.get("infrastructure", {}),
+        # copies: the stats dicts are mutated in place, and the delta stream diffs this
+        # dict against the previous tick by value (recommendations are rebuilt every tick)
+        "infrastructure": {**infra, "stats": dict(infra.get("stats") or {})},
         "collision_pairs": pairs,
-        "stats": raw.get("stats", {}),
+        "stats": dict(raw.get("stats") or {}),
         "timestamp": _safe_num(raw.get("timestamp", 0), 0, 9999999999),
         "grid": raw.get("grid", None),
         "background_traffic": bool(raw.get("background_traffic", False)),
@@ -178,31 +319,179 @@ def sanitize_full_state(raw: dict) -> dict:
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(None)):
+async def websocket_endpoint(
+    websocket: WebSocket, token: Optional[str] = Query(None), fmt: str = Query("json"),
+):
     if API_TOKEN and token != API_TOKEN:
         logger.warning("[SECURITY] WebSocket REFUZAT — token invalid sau lipsa")
         await websocket.accept()
         await websocket.close(code=1008, reason="Unauthorized")
         return
 
-    if len(active_connections) >= MAX_WS_CONNECTIONS:
+    # the slot is taken before accept() yields, so concurrent handshakes cannot overshoot the cap
+    if _ws_slots.locked():
         logger.warning(f"[SECURITY] WebSocket REFUZAT — max {MAX_WS_CONNECTIONS} conexiuni atinse")
         await websocket.close(code=1013, reason="Too many connections")
         return
+    await _ws_slots.acquire()
+
+    writer = None
+    try:
+        # msgpack may also be negotiated through the Sec-WebSocket-Protocol header
+        subprotocol = None
+        if msgpack is not None and "msgpack" in websocket.scope.get("subprotocols", ()):
+            fmt = subprotocol = "msgpack"
+        await websocket.accept(subprotocol=subprotocol)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        if fmt not in ("json", "msgpack", "delta") or (fmt == "msgpack" and msgpack is None):
+            fmt = "json"
+        active_connections[websocket] = queue
+        _ws_formats[websocket] = fmt
+        _refresh_ws_targets()
+        writer = asyncio.ensure_future(_ws_writer(websocket, queue))
+        logger.info(f"[WS] Conexiune acceptata ({len(active_connections)}/{MAX_WS_CONNECTIONS})")
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except Exception:
+        pass
+    finally:
+        _drop_connection(websocket)
+        if writer is not None:
+            writer.cancel()
+        _ws_slots.release()
 
-    await websocket.accept()
-    active_connections.add(websocket)
-    logger.info(f"[WS] Conexiune acceptata ({len(active_connections)}/{MAX_WS_CONNECTIONS})")
+
+async def _ws_writer(ws: WebSocket, queue: asyncio.Queue):
+    # backpressure: ws.send waits on the transport drain once its write buffer is past the
+    # websockets high-water mark, so at most one queued frame + that buffer exist per client;
+    # a client stuck there past WS_SEND_TIMEOUT is closed
     try:
         while True:
-            raw_state = simulation.get_full_state()
-            safe_state = sanitize_full_state(raw_state)
-            await websocket.send_json(safe_state)
-            await asyncio.sleep(0.05)
-    except WebSocketDisconnect:
-        active_connections.discard(websocket)
+            frame = await queue.get()
+            await asyncio.wait_for(ws.send(frame), timeout=WS_SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        _drop_connection(ws)
+        logger.warning(f"[WS] Client blocat > {WS_SEND_TIMEOUT}s — conexiune inchisa")
+        try:
+            await ws.close(code=1011, reason="Client too slow")
+        except Exception:
+            pass
     except Exception:
-        active_connections.discard(websocket)
+        _drop_connection(ws)
+
+
+_state_snapshot = (-1, None, "")
+_rest_payload = (-1, "")
+_msgpack_payload = (-1, b"")
+
+
+_state_lock = threading.Lock()
+
+
+def _get_state_snapshot() -> tuple:
+    # one snapshot + sanitize + encode per broadcast tick, shared by every WS client
+    global _state_snapshot
+    tick = int(time.monotonic() / WS_BROADCAST_INTERVAL)
+    snapshot = _state_snapshot
+    if tick == snapshot[0]:
+        return snapshot
+    # REST threadpool and the broadcaster thread can miss together; only the first builds
+    with _state_lock:
+        if tick != _state_snapshot[0]:
+            safe_state = sanitize_full_state(simulation.get_full_state(), rounded=True)
+            _state_snapshot = (tick, safe_state, _encode_json(safe_state))
+        return _state_snapshot
+
+
+def _get_state_payload() -> str:
+    # REST: full precision, built only when polled and cached on the same tick grid
+    global _rest_payload
+    tick = int(time.monotonic() / WS_BROADCAST_INTERVAL)
+    if tick != _rest_payload[0]:
+        _rest_payload = (tick, _encode_json(sanitize_full_state(simulation.get_full_state())))
+    return _rest_payload[1]
+
+
+def _state_delta(prev: dict, cur: dict) -> dict:
+    # top-level keys by value, agents by id; nested values are replaced whole
+    prev_agents, agents = prev.get("agents", {}), cur.get("agents", {})
+    return {
+        "type": "patch",
+        "set": {k: v for k, v in cur.items() if k != "agents" and prev.get(k) != v},
+        "agents": {k: v for k, v in agents.items() if prev_agents.get(k) != v},
+        "removed": [k for k in prev_agents if k not in agents],
+    }
+
+
+def _get_state_msgpack(snapshot: tuple) -> bytes:
+    global _msgpack_payload
+    tick, safe_state, _ = snapshot
+    if tick != _msgpack_payload[0]:
+        _msgpack_payload = (tick, msgpack.packb(safe_state, use_bin_type=True))
+    return _msgpack_payload[1]
+
+
+async def _broadcast_loop():
+    last_payload = None
+    last_state = None
+    sent = 0
+    last_version = last_targets = None
+    last_built = 0.0
+    while True:
+        version = (channel.version, simulation.running, simulation.active_scenario, bg_traffic.active)
+        # skip the rebuild while no agent changed, unless clients changed or the idle refresh is due
+        idle = (
+            version == last_version and _ws_targets is last_targets
+            and time.monotonic() - last_built < WS_IDLE_REFRESH
+        )
+        if _ws_targets and not idle:
+            last_version, last_targets, last_built = version, _ws_targets, time.monotonic()
+            try:
+                # channel locks + collision pairs + sanitize run off the loop so sends keep flowing
+                snapshot = await asyncio.to_thread(_get_state_snapshot)
+                _, state, payload = snapshot
+                formats = {fmt for _, fmt in _ws_targets}
+                packed = _get_state_msgpack(snapshot) if "msgpack" in formats else None
+                patch = None
+                if "delta" in formats and last_state is not None and sent % WS_DELTA_SNAPSHOT_EVERY:
+                    patch = _encode_json(_state_delta(last_state, state))
+            except Exception as e:
+                logger.error(f"[WS] Snapshot failed: {e}")
+                payload = None
+            # sleep jitter can wake us twice inside one tick; the cached frame was already sent
+            if payload is not None and payload is not last_payload:
+                last_payload = payload
+                last_state = state
+                sent += 1
+                # ASGI send messages built once and shared by every client of that format
+                frames = {
+                    "json": {"type": "websocket.send", "text": payload},
+                    "msgpack": {"type": "websocket.send", "bytes": packed},
+                }
+                if "delta" in formats:
+                    snapshot_text = '{"type":"snapshot","state":' + payload + "}"
+                    snapshot_frame = {"type": "websocket.send", "text": snapshot_text}
+                    patch_frame = {"type": "websocket.send", "text": patch} if patch else snapshot_frame
+                    if patch is None:
+                        _delta_synced.clear()
+                # latest-wins: a client still sending loses its stale queued frame
+                for queue, fmt in _ws_targets:
+                    dropped = queue.full()
+                    if dropped:
+                        queue.get_nowait()
+                    if fmt != "delta":
+                        queue.put_nowait(frames[fmt])
+                    elif dropped or queue not in _delta_synced:
+                        # a lost patch breaks the chain; resync with a full snapshot
+                        queue.put_nowait(snapshot_frame)
+                        _delta_synced.add(queue)
+                    else:
+                        queue.put_nowait(patch_frame)
+        # phase-locked to the snapshot tick grid: build time doesn't stretch the cadence, and a
+        # late wake-up just lands on the next boundary; +1ms since timers may fire a hair early
+        await asyncio.sleep(WS_BROADCAST_INTERVAL - time.monotonic() % WS_BROADCAST_INTERVAL + 0.001)
 
 
 VALID_SCENARIOS = frozenset([
@@ -210,24 +499,37 @@ VALID_SCENARIOS = frozenset([
     "right_of_way", "multi_vehicle_traffic_light",
     "drunk_driver", "drunk_driver_police",
 ])
+_UNKNOWN_SCENARIO_ERROR = f"Unknown scenario. Use one of: {sorted(VALID_SCENARIOS)}"
 
 
-@app.get("/")
-def root():
-    from llm_brain import LLM_ENABLED, LLM_MODEL, GEMINI_API_KEY
-    has_key = bool(GEMINI_API_KEY) and "INLOCUIESTE" not in GEMINI_API_KEY
-    return {
-        "status": "ok",
-        "message": "V2X Safety Agent running",
-        "llm_enabled": LLM_ENABLED,
-        "llm_model": LLM_MODEL if LLM_ENABLED else None,
-        "llm_api_key_set": has_key,
-        "security": "enabled",
-        "auth_required": bool(API_TOKEN),
-    }
+def _static_body(obj) -> tuple:
+    # encoded once at import; the ETag lets repeat polls come back as 304 with no body
+    body = _encode_json(obj).encode()
+    return body, '"' + hashlib.md5(body, usedforsecurity=False).hexdigest() + '"'
 
 
-from pydantic import BaseModel
+def _static_response(static: tuple, if_none_match: Optional[str]) -> Response:
+    body, etag = static
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+_ROOT_BODY = _static_body({
+    "status": "ok",
+    "message": "V2X Safety Agent running",
+    "llm_enabled": LLM_ENABLED,
+    "llm_model": LLM_MODEL if LLM_ENABLED else None,
+    "llm_api_key_set": bool(GEMINI_API_KEY) and "INLOCUIESTE" not in GEMINI_API_KEY,
+    "security": "enabled",
+    "auth_required": bool(API_TOKEN),
+})
+
+
+@app.get("/")
+def root(if_none_match: Optional[str] = Header(None)):
+    return _static_response(_ROOT_BODY, if_none_match)
+
 
 class InitRequest(BaseModel):
     mode: str = "CITY"
@@ -244,7 +546,7 @@ def init_simulation(body: InitRequest):
 @app.post("/simulation/start/{scenario}", dependencies=[Depends(verify_token), Depends(rate_limit)])
 def start_simulation(scenario: str):
     if scenario not in VALID_SCENARIOS:
-        return {"error": f"Unknown scenario. Use one of: {sorted(VALID_SCENARIOS)}"}
+        return {"error": _UNKNOWN_SCENARIO_ERROR}
     simulation.start(scenario)
     return {"status": "started", "scenario": scenario}
 
@@ -263,40 +565,42 @@ def restart_simulation():
 
 @app.get("/simulation/state", dependencies=[Depends(rate_limit)])
 def get_state():
-    raw = simulation.get_full_state()
-    return sanitize_full_state(raw)
+    return Response(content=_get_state_payload(), media_type="application/json")
+
+
+_SCENARIOS_BODY = _static_body({
+    "scenarios": [
+        {
+            "id": "right_of_way",
+            "name": "3 Vehicule — Prioritate de Dreapta",
+            "description": "3 vehicule din 3 directii, fara semafor. Negociere prin regula prioritatii de dreapta.",
+            "vehicles": 3,
+        },
+        {
+            "id": "multi_vehicle_traffic_light",
+            "name": "4 Vehicule — Cu Semafor",
+            "description": "4 vehicule din toate directiile cu semafor activ.",
+            "vehicles": 4,
+        },
+        {
+            "id": "emergency_vehicle",
+            "name": "Ambulanta — Cu Semafor",
+            "description": "Ambulanta vs vehicul normal cu semafor activ. Semaforul se adapteaza la urgenta.",
+            "vehicles": 2,
+        },
+        {
+            "id": "emergency_vehicle_no_lights",
+            "name": "Ambulanta — Fara Semafor",
+            "description": "Ambulanta vs vehicul normal fara semafor. Prioritate negociata prin V2X.",
+            "vehicles": 2,
+        },
+    ]
+})
 
 
 @app.get("/simulation/scenarios")
-def list_scenarios():
-    return {
-        "scenarios": [
-            {
-                "id": "right_of_way",
-                "name": "3 Vehicule — Prioritate de Dreapta",
-                "description": "3 vehicule din 3 directii, fara semafor. Negociere prin regula prioritatii de dreapta.",
-                "vehicles": 3,
-            },
-            {
-                "id": "multi_vehicle_traffic_light",
-                "name": "4 Vehicule — Cu Semafor",
-                "description": "4 vehicule din toate directiile cu semafor activ.",
-                "vehicles": 4,
-            },
-            {
-                "id": "emergency_vehicle",
-                "name": "Ambulanta — Cu Semafor",
-                "description": "Ambulanta vs vehicul normal cu semafor activ. Semaforul se adapteaza la urgenta.",
-                "vehicles": 2,
-            },
-            {
-                "id": "emergency_vehicle_no_lights",
-                "name": "Ambulanta — Fara Semafor",
-                "description": "Ambulanta vs vehicul normal fara semafor. Prioritate negociata prin V2X.",
-                "vehicles": 2,
-            },
-        ]
-    }
+def list_scenarios(if_none_match: Optional[str] = Header(None)):
+    return _static_response(_SCENARIOS_BODY, if_none_match)
 
 
 @app.get("/v2x/channel")
@@ -304,11 +608,13 @@ def get_channel():
     return channel.to_dict()
 
 
+_drunk_ids = itertools.count(1)
+_police_ids = itertools.count(1)
+_ambulance_ids = itertools.count(1)
+
+
 @app.post("/simulation/spawn-drunk", dependencies=[Depends(verify_token), Depends(rate_limit)])
 def spawn_drunk_driver():
-    import random
-    from agents import VehicleAgent
-    from background_traffic import _build_route, _ALL_ROUTE_KEYS
 
     route_key = random.choice(_ALL_ROUTE_KEYS)
     waypoints, direction = _build_route(route_key)
@@ -318,10 +624,7 @@ def spawn_drunk_driver():
     start_x, start_y = waypoints[0]
     speed = random.uniform(8.0, 12.0)
 
-    if not hasattr(spawn_drunk_driver, '_counter'):
-        spawn_drunk_driver._counter = 0
-    spawn_drunk_driver._counter += 1
-    agent_id = f"DRUNK_{spawn_drunk_driver._counter:03d}"
+    agent_id = f"DRUNK_{next(_drunk_ids):03d}"
 
     vehicle = VehicleAgent(
         agent_id=agent_id,
@@ -346,9 +649,6 @@ def spawn_drunk_driver():
 
 @app.post("/simulation/spawn-police", dependencies=[Depends(verify_token), Depends(rate_limit)])
 def spawn_police_car():
-    import random
-    from agents import VehicleAgent
-    from background_traffic import _build_route, _ALL_ROUTE_KEYS
 
     route_key = random.choice(_ALL_ROUTE_KEYS)
     waypoints, direction = _build_route(route_key)
@@ -358,10 +658,7 @@ def spawn_police_car():
     start_x, start_y = waypoints[0]
     speed = random.uniform(20.0, 25.0)
 
-    if not hasattr(spawn_police_car, '_counter'):
-        spawn_police_car._counter = 0
-    spawn_police_car._counter += 1
-    agent_id = f"POLICE_{spawn_police_car._counter:03d}"
+    agent_id = f"POLICE_{next(_police_ids):03d}"
 
     vehicle = VehicleAgent(
         agent_id=agent_id,
@@ -385,9 +682,6 @@ def spawn_police_car():
 
 @app.post("/simulation/spawn-ambulance", dependencies=[Depends(verify_token), Depends(rate_limit)])
 def spawn_ambulance():
-    import random
-    from agents import VehicleAgent
-    from background_traffic import _build_route, _ALL_ROUTE_KEYS
 
     route_key = random.choice(_ALL_ROUTE_KEYS)
     waypoints, direction = _build_route(route_key)
@@ -397,10 +691,7 @@ def spawn_ambulance():
     start_x, start_y = waypoints[0]
     speed = random.uniform(18.0, 22.0)
 
-    if not hasattr(spawn_ambulance, '_counter'):
-        spawn_ambulance._counter = 0
-    spawn_ambulance._counter += 1
-    agent_id = f"AMBULANCE_{spawn_ambulance._counter:03d}"
+    agent_id = f"AMBULANCE_{next(_ambulance_ids):03d}"
 
     vehicle = VehicleAgent(
         agent_id=agent_id,
@@ -436,9 +727,12 @@ def stop_bg_traffic():
     return {"status": "stopped"}
 
 
+_GRID_BODY = _static_body(get_grid_info())
+
+
 @app.get("/grid")
-def get_grid():
-    return get_grid_info()
+def get_grid(if_none_match: Optional[str] = Header(None)):
+    return _static_response(_GRID_BODY, if_none_match)
 
 
 @app.get("/v2x/history")
@@ -449,7 +743,6 @@ def get_history(last_n: int = 50):
 
 @app.get("/api/history")
 def get_session_history():
-    import sqlite3
     db_path = os.path.join(os.path.dirname(__file__), "history.db")
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
@@ -464,34 +757,29 @@ def get_session_history():
 
 @app.post("/api/history/save", dependencies=[Depends(verify_token), Depends(rate_limit)])
 def save_session_now():
-    from telemetry import telemetry
     telemetry.save_session()
     return {"status": "saved"}
 
 
 @app.get("/telemetry/report", dependencies=[Depends(verify_token)])
 def get_telemetry_report():
-    from telemetry import telemetry
     return telemetry.generate_report()
 
 
 @app.post("/telemetry/export", dependencies=[Depends(verify_token), Depends(rate_limit)])
 def export_telemetry():
-    from telemetry import telemetry
     filepath = telemetry.export_to_file()
     return {"status": "exported", "filepath": filepath}
 
 
 @app.get("/telemetry/history", dependencies=[Depends(verify_token)])
 def get_telemetry_history(last_n: int = 10):
-    from telemetry import telemetry
     last_n = max(1, min(last_n, 50))
     return {"reports": telemetry.get_history(last_n)}
 
 
 @app.get("/security/stats", dependencies=[Depends(verify_token)])
 def security_stats():
-    from llm_brain import get_circuit_breaker_stats
     result = {
         "v2x_channel": channel.get_security_stats(),
         "ws_connections": len(active_connections),
@@ -499,6 +787,7 @@ def security_stats():
         "auth_enabled": bool(API_TOKEN),
         "rest_rate_limit_per_min": REST_RATE_LIMIT,
         "llm_circuit_breaker": get_circuit_breaker_stats(),
+        "llm_batcher": get_batcher_stats(),
     }
     try:
         result["intersection_coordinator"] = bg_traffic._coordinator.get_stats()
@@ -508,5 +797,17 @@ def security_stats():
 
 
 if __name__ == "__main__":
+    import importlib.util
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=1)
+    # uvicorn[standard] ships both, except uvloop on Windows; fall back to the pure-Python stack
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=8000, workers=1,
+        loop=loop, http=http, ws="websockets",
+        # the same frame goes to every client; per-socket deflate would recompress it N times.
+        # Opt back in for JSON clients on slow links; same env var as the uvicorn CLI
+        ws_per_message_deflate=os.getenv("UVICORN_WS_PER_MESSAGE_DEFLATE", "false").lower() in ("1", "true"),
+        # clients never send state, only control frames; cap inbound messages at 1 MiB
+        ws_max_size=2 ** 20,
+    )
@@ -1,11 +1,18 @@
 
 import math
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 from v2x_channel import V2XMessage
-from collision_detector import time_to_intersection, INTERSECTION_CENTER, INTERSECTION_RADIUS
+from collision_detector import time_to_intersection, risky_pairs, INTERSECTION_CENTER, INTERSECTION_RADIUS
 
 STOP_LINE_DISTANCE = 35.0
 
+# approaches clockwise, so the one on your right is always index - 1 (mod 4)
+_APPROACHES = ("north", "east", "south", "west")
+_APPROACH_INDEX = {name: i for i, name in enumerate(_APPROACHES)}
+_PRIORITY_ORDER = {"go": 0, "yield": 1, "brake": 2, "stop": 3}
+# decision -> (fraction of target speed at 60m+ from the line, minimum speed)
+_SLOWDOWN = {"yield": (0.4, 2.0), "brake": (0.2, 0.0)}
+
 
 def _dist_to_stop_line(agent: V2XMessage) -> float:
     rad = math.radians(agent.direction)
@@ -21,34 +28,43 @@ def _is_inside_box(agent: V2XMessage) -> bool:
     return abs(agent.x) < STOP_LINE_DISTANCE and abs(agent.y) < STOP_LINE_DISTANCE
 
 
-def get_approach_direction(agent: V2XMessage) -> str:
+def _approach_index(agent: V2XMessage) -> int:
     cx, cy = INTERSECTION_CENTER
     dx = agent.x - cx
     dy = agent.y - cy
     if abs(dx) > abs(dy):
-        return "east" if dx > 0 else "west"
+        return 1 if dx > 0 else 3
     else:
-        return "north" if dy > 0 else "south"
+        return 0 if dy > 0 else 2
+
+
+def get_approach_direction(agent: V2XMessage) -> str:
+    return _APPROACHES[_approach_index(agent)]
+
+
+def _right_of(my_approach: int, other_approach: int) -> bool:
+    return (other_approach - my_approach) & 3 == 3
 
 
 def is_on_right(my_direction: str, other_direction: str) -> bool:
-    right_map = {
-        "north": "west",
-        "east":  "north",
-        "south": "east",
-        "west":  "south",
-    }
-    return right_map.get(my_direction) == other_direction
+    my = _APPROACH_INDEX.get(my_direction)
+    other = _APPROACH_INDEX.get(other_direction)
+    return my is not None and other is not None and _right_of(my, other)
 
 
-def resolve_priority(agent1: V2XMessage, agent2: V2XMessage) -> Tuple[str, str, str]:
+def resolve_priority(agent1: V2XMessage, agent2: V2XMessage,
+                     t1: Optional[float] = None, t2: Optional[float] = None,
+                     app1: Optional[int] = None, app2: Optional[int] = None) -> Tuple[str, str, str]:
+    # t*/app* (approach indices) may be passed in precomputed by callers that resolve many pairs per agent
     if agent1.is_emergency and not agent2.is_emergency:
         return "go", "stop", "emergency_vehicle"
     if agent2.is_emergency and not agent1.is_emergency:
         return "stop", "go", "emergency_vehicle"
 
-    t1 = time_to_intersection(agent1)
-    t2 = time_to_intersection(agent2)
+    if t1 is None:
+        t1 = time_to_intersection(agent1)
+    if t2 is None:
+        t2 = time_to_intersection(agent2)
     time_diff = abs(t1 - t2)
 
     if time_diff > 2.0:
@@ -57,12 +73,14 @@ def resolve_priority(agent1: V2XMessage, agent2: V2XMessage) -> Tuple[str, str,
         else:
             return "yield", "go", "first_arrival"
 
-    dir1 = get_approach_direction(agent1)
-    dir2 = get_approach_direction(agent2)
+    if app1 is None:
+        app1 = _approach_index(agent1)
+    if app2 is None:
+        app2 = _approach_index(agent2)
 
-    if is_on_right(dir1, dir2):
+    if _right_of(app1, app2):
         return "yield", "go", "right_of_way"
-    elif is_on_right(dir2, dir1):
+    elif _right_of(app2, app1):
         return "go", "yield", "right_of_way"
 
     if agent1.speed < agent2.speed:
@@ -77,53 +95,57 @@ def resolve_priority(agent1: V2XMessage, agent2: V2XMessage) -> Tuple[str, str,
 
 
 def compute_decisions_for_all(all_agents: Dict[str, V2XMessage]) -> Dict[str, dict]:
-    from collision_detector import assess_intersection_risk
-
-    decisions = {}
-    for agent_id in all_agents:
-        decisions[agent_id] = {"decision": "go", "reason": "clear", "priority_score": 0}
-
+    decisions = {
+        agent_id: {"decision": "go", "reason": "clear", "priority_score": 0}
+        for agent_id in all_agents
+    }
     agents_list = [a for a in all_agents.values() if a.agent_type == "vehicle"]
-    priority_order = {"go": 0, "yield": 1, "brake": 2, "stop": 3}
-
-    for i in range(len(agents_list)):
-        for j in range(i + 1, len(agents_list)):
-            a1 = agents_list[i]
-            a2 = agents_list[j]
-            risk = assess_intersection_risk(a1, a2)
-
-            if risk in ("high", "collision"):
-                dec1, dec2, reason = resolve_priority(a1, a2)
-
-                if priority_order.get(dec1, 0) > priority_order.get(decisions[a1.agent_id]["decision"], 0):
-                    decisions[a1.agent_id] = {"decision": dec1, "reason": reason, "priority_score": i}
-
-                if priority_order.get(dec2, 0) > priority_order.get(decisions[a2.agent_id]["decision"], 0):
-                    decisions[a2.agent_id] = {"decision": dec2, "reason": reason, "priority_score": j}
-
+    if len(agents_list) < 2:
+        return decisions
+
+    # the O(N^2) risk scan is vectorized; only the few risky pairs are negotiated in Python
+    pairs = risky_pairs(agents_list)
+    if not pairs:
+        return decisions
+
+    priority_order = _PRIORITY_ORDER
+    # an agent can sit in several risky pairs: its arrival time and approach are computed once
+    involved = {k for i, j, _ in pairs for k in (i, j)}
+    tti = {k: time_to_intersection(agents_list[k]) for k in involved}
+    approach = {k: _approach_index(agents_list[k]) for k in involved}
+    # most restrictive decision per vehicle index, kept as ranks; dicts are built once at the end
+    rank = [0] * len(agents_list)
+    best = {}
+    for i, j, _ in pairs:
+        dec1, dec2, reason = resolve_priority(
+            agents_list[i], agents_list[j], tti[i], tti[j], approach[i], approach[j])
+        r1 = priority_order.get(dec1, 0)
+        if r1 > rank[i]:
+            rank[i] = r1
+            best[i] = (dec1, reason)
+        r2 = priority_order.get(dec2, 0)
+        if r2 > rank[j]:
+            rank[j] = r2
+            best[j] = (dec2, reason)
+
+    for k, (dec, reason) in best.items():
+        decisions[agents_list[k].agent_id] = {"decision": dec, "reason": reason, "priority_score": k}
     return decisions
 
 
 def compute_recommended_speed(agent: V2XMessage, decision: str, target_speed: float = 25.0) -> float:
-    dist_to_edge = _dist_to_stop_line(agent)
-    inside = _is_inside_box(agent)
-
-    if decision == "go":
+    if decision == "go" or _is_inside_box(agent):
         return target_speed
-
-    if inside:
-        return target_speed
-
-    if dist_to_edge < 1.0:
-        return 0.0
-
     if decision == "stop":
         return 0.0
 
-    factor = min(1.0, dist_to_edge / 60.0)
-    if decision == "yield":
-        return max(2.0, target_speed * factor * 0.4)
-    elif decision == "brake":
-        return max(0.0, target_speed * factor * 0.2)
+    # trig only for vehicles that actually have to slow before the line
+    dist_to_edge = _dist_to_stop_line(agent)
+    if dist_to_edge < 1.0:
+        return 0.0
 
-    return target_speed
+    slowdown = _SLOWDOWN.get(decision)
+    if slowdown is None:
+        return target_speed
+    scale, floor = slowdown
+    return max(floor, target_speed * min(1.0, dist_to_edge / 60.0) * scale)
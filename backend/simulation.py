@@ -5,11 +5,16 @@ from typing import List, Optional
 from agents import VehicleAgent
 from infrastructure_agent import InfrastructureAgent
 from v2x_channel import channel
-from collision_detector import get_collision_pairs
+from collision_detector import get_collision_pairs_cached
 from background_traffic import bg_traffic, get_grid_info, get_scenario_grid_info
 from telemetry import telemetry
 
 LANE_OFFSET = 10.0
+MONITOR_IDLE_TIMEOUT = 0.5   # still wake this often so elapsed_time / stale cleanup tick
+# at most one pass per interval however often vehicles publish. Keep it at the old 0.5s poll:
+# risk_detected / collisions_prevented are counted per pass, so a faster cadence inflates them
+MONITOR_MIN_INTERVAL = 0.5
+STATE_PAIRS_MAX_AGE = 0.1    # state polls reuse the monitor's pairs if this fresh
 
 
 class SimulationManager:
@@ -29,6 +34,7 @@ class SimulationManager:
         self._monitor_thread = None
         self._use_traffic_light = False
         self._monitoring = False
+        self._monitor_wake = threading.Event()
 
     def start_monitor(self):
         """Start the collision-monitoring loop (used in CITY mode)."""
@@ -37,12 +43,22 @@ class SimulationManager:
         self._monitoring = True
         if not self._start_time:
             self._start_time = time.time()
-        self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._spawn_monitor()
+
+    def _spawn_monitor(self):
+        # each loop owns its wake event: setting the old one retires any loop still running,
+        # and a later restart can never revive it (which used to leave two monitors counting)
+        self._monitor_wake.set()
+        self._monitor_wake = threading.Event()
+        self._monitor_thread = threading.Thread(
+            target=self._monitor_loop, args=(self._monitor_wake,), daemon=True)
         self._monitor_thread.start()
 
     def stop_monitor(self):
         """Stop the collision-monitoring loop."""
         self._monitoring = False
+        self._monitor_wake.set()
+        channel.changed.set()  # wake a loop parked on the channel; version check makes it a no-op
 
     def set_mode(self, mode: str):
         if mode not in ("CITY", "SCENARIO"):
@@ -230,17 +246,18 @@ class SimulationManager:
 
         self._use_traffic_light = scenario in ("emergency_vehicle", "multi_vehicle_traffic_light")
         if self._use_traffic_light:
-            self.infrastructure = InfrastructureAgent()
+            self.infrastructure.reset()
             self.infrastructure.start()
         for vehicle in self.vehicles:
             vehicle.start()
 
-        self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self._monitor_thread.start()
+        self._spawn_monitor()
 
     def stop(self):
         self.running = False
         self._monitoring = False
+        self._monitor_wake.set()
+        channel.changed.set()
         telemetry.record_scenario_end()
         try:
             telemetry.save_session()
@@ -267,52 +284,57 @@ class SimulationManager:
             channel.remove_agent(v.agent_id)
         self.vehicles = []
 
-    def _monitor_loop(self):
+    def _monitor_loop(self, wake: threading.Event):
         prev_risks = set()
-        while self._monitoring:
-            all_states = channel.get_all_states()
-            pairs = get_collision_pairs(all_states)
-            current_risks = {
-                (p["agent1"], p["agent2"])
-                for p in pairs
-                if p["risk"] in ("collision", "high")
-            }
-            for pair in prev_risks:
-                if pair not in current_risks:
-                    self.stats["collisions_prevented"] += 1
-                    telemetry.record_event("collision_prevented", {
-                        "agents": list(pair),
-                    })
-            prev_risks = current_risks
-
-            for p in pairs:
-                if p["risk"] in ("high", "collision"):
-                    telemetry.record_event("risk_detected", {
-                        "level": p["risk"],
-                        "agents": [p["agent1"], p["agent2"]],
-                        "ttc": p["ttc"],
-                    })
+        seen_version = None
+        while self._monitoring and not wake.is_set():
+            started = time.monotonic()
+            channel.changed.clear()
+            if channel.version != seen_version:
+                seen_version = channel.version
+                pairs = get_collision_pairs_cached()
+                current_risks = {
+                    (p["agent1"], p["agent2"])
+                    for p in pairs
+                    if p["risk"] in ("collision", "high")
+                }
+                for pair in prev_risks:
+                    if pair not in current_risks:
+                        self.stats["collisions_prevented"] += 1
+                        telemetry.record_event("collision_prevented", {
+                            "agents": list(pair),
+                        })
+                prev_risks = current_risks
+
+                for p in pairs:
+                    if p["risk"] in ("high", "collision"):
+                        telemetry.record_event("risk_detected", {
+                            "level": p["risk"],
+                            "agents": [p["agent1"], p["agent2"]],
+                            "ttc": p["ttc"],
+                        })
             if self._start_time:
                 self.stats["elapsed_time"] = round(time.time() - self._start_time, 1)
 
             stale = channel.cleanup_stale_agents()
             if stale:
+                stale = set(stale)
                 for v in self.vehicles:
                     if v.agent_id in stale and v._running:
                         v.stop()
                         self.stats.setdefault("stale_agents_removed", 0)
                         self.stats["stale_agents_removed"] += 1
 
-            time.sleep(0.5)
+            # both waits count from the start of the pass, so an idle channel still ticks every
+            # MONITOR_IDLE_TIMEOUT rather than MIN_INTERVAL + IDLE_TIMEOUT
+            if wake.wait(max(0.0, started + MONITOR_MIN_INTERVAL - time.monotonic())):
+                break
+            channel.changed.wait(max(0.0, started + MONITOR_IDLE_TIMEOUT - time.monotonic()))
 
     def get_full_state(self) -> dict:
-        all_agents = channel.to_dict()
-        all_collision_pairs = get_collision_pairs(channel.get_all_states())
-        collision_pairs = [
-            p for p in all_collision_pairs
-            if not (p["agent1"].startswith("BG_") and p["agent2"].startswith("BG_"))
-            and not (p["agent1"].startswith("AMBULANCE_") and p["agent2"].startswith("AMBULANCE_"))
-        ]
+        version, states, all_agents = channel.get_snapshot()
+        collision_pairs = get_collision_pairs_cached(
+            skip_same_group=True, snapshot=(version, states), max_age=STATE_PAIRS_MAX_AGE)
         use_tl = self._use_traffic_light
         grid = get_grid_info() if self.mode == "CITY" else get_scenario_grid_info()
         return {
@@ -2,13 +2,15 @@
 import sys
 import os
 import math
+import random
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from v2x_channel import V2XMessage
+from v2x_channel import V2XMessage, channel
 from collision_detector import (
-    compute_ttc, distance, assess_intersection_risk,
+    compute_ttc, distance, distance_sq, assess_intersection_risk,
     get_collision_pairs, time_to_intersection,
-    _are_on_same_road_opposite_dirs,
+    _are_on_same_road_opposite_dirs, pairwise_risk, RISK_LEVELS,
+    get_collision_pairs_cached,
 )
 
 
@@ -33,6 +35,11 @@ def test_distance_symmetric():
     assert abs(distance(1, 2, 4, 6) - distance(4, 6, 1, 2)) < 0.001
 
 
+def test_distance_sq_matches_distance():
+    assert distance_sq(0, 0, 3, 4) == 25.0
+    assert abs(distance_sq(1, 2, 4, 6) - distance(1, 2, 4, 6) ** 2) < 0.001
+
+
 def test_ttc_converging():
     a1 = _make_agent("A", 0, 100, 10, 180)
     a2 = _make_agent("B", 100, 0, 10, 270)
@@ -128,6 +135,61 @@ def test_tti_stationary():
     assert tti == float('inf')
 
 
+def test_pairwise_risk_matches_scalar():
+    rng = random.Random(7)
+    agents = []
+    for k in range(40):
+        d = rng.choice([0.0, 90.0, 180.0, 270.0, rng.uniform(0, 360)])
+        agents.append(_make_agent(
+            f"A{k}", rng.uniform(-150, 150), rng.uniform(-150, 150),
+            rng.choice([0.0, rng.uniform(0, 25)]), d,
+        ))
+    codes = pairwise_risk(agents)
+    for i, a1 in enumerate(agents):
+        for j, a2 in enumerate(agents):
+            if i != j:
+                assert RISK_LEVELS[codes[i, j]] == assess_intersection_risk(a1, a2)
+
+
+def test_collision_pairs_prune_keeps_fast_distant_pairs():
+    # ~205m apart (beyond DANGER_ZONE_RADIUS) but closing fast enough for ttc <= TTC_HIGH
+    a1 = _make_agent("A", -5, 140, 25, 180)
+    a2 = _make_agent("B", 140, -5, 25, 270)
+    assert distance(a1.x, a1.y, a2.x, a2.y) > 200
+    pairs = get_collision_pairs({"A": a1, "B": a2})
+    assert len(pairs) == 1
+    assert pairs[0]["risk"] == "high"
+
+
+def test_collision_pairs_cached_follows_channel_version():
+    channel.clear_all()
+    try:
+        channel.publish(_make_agent("A", -10, 45, 10, 180))
+        channel.publish(_make_agent("B", 45, -10, 10, 270))
+        first = get_collision_pairs_cached()
+        assert len(first) == 1
+        assert get_collision_pairs_cached() is first
+        channel.publish(_make_agent("A", -10, 44, 10, 180))
+        assert get_collision_pairs_cached(max_age=60.0) is first
+        assert get_collision_pairs_cached() is not first
+        channel.remove_agent("B")
+        assert get_collision_pairs_cached() == []
+    finally:
+        channel.clear_all()
+
+
+def test_collision_pairs_skip_same_group():
+    agents = {
+        "BG_1": _make_agent("BG_1", -10, 45, 10, 180),
+        "BG_2": _make_agent("BG_2", 45, -10, 10, 270),
+        "CAR": _make_agent("CAR", 45, -12, 10, 270),
+    }
+    ids = {(p["agent1"], p["agent2"]) for p in get_collision_pairs(agents, skip_same_group=True)}
+    assert ("BG_1", "BG_2") not in ids
+    assert ("BG_1", "CAR") in ids
+    assert len(get_collision_pairs(agents)) == len(ids) + 1
+
+
 if __name__ == "__main__":
     import pytest
     pytest.main([__file__, "-v"])
@@ -1,11 +1,20 @@
 
 import sys
 import os
+import json
 import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from llm_brain import AgentMemory, CircuitBreaker
+import llm_brain
+from llm_brain import (
+    AgentMemory, CircuitBreaker, DecisionBatcher, DecisionCache, LLMBrain,
+    effective_interval, entry_ttc, json_value_end, parse_batch_response, situation_key,
+)
 
 
 class TestAgentMemory:
@@ -72,6 +81,37 @@ class TestAgentMemory:
         mem.record_near_miss("V2", 2.5, "high")
         assert len(mem._lessons) == 1
 
+    def test_near_miss_rate_limited_per_vehicle(self, monkeypatch):
+        mem = AgentMemory("V1")
+        mem.record_near_miss("V2", 2.5, "high")
+        mem.record_near_miss("V2", 2.4, "high")
+        mem.record_near_miss("V3", 2.4, "high")
+        assert len(mem._near_misses) == 2
+        later = time.time() + llm_brain.NEAR_MISS_INTERVAL + 0.1
+        monkeypatch.setattr(llm_brain.time, "time", lambda: later)
+        mem.record_near_miss("V2", 2.4, "high")
+        assert len(mem._near_misses) == 3
+
+    def test_record_near_misses_filters_by_ttc(self):
+        mem = AgentMemory("V1")
+        mem.record_near_misses([
+            {"id": "V2", "ttc": "1.5s", "ttc_value": 1.52},
+            {"id": "V3", "ttc": "9.0s", "ttc_value": 9.0},
+            {"id": "V4", "ttc": "inf", "ttc_value": float("inf")},
+        ], "high")
+        assert [e["other_vehicle"] for e in mem._near_misses] == ["V2"]
+
+    def test_evicted_lesson_can_be_learned_again(self, monkeypatch):
+        mem = AgentMemory("V1")
+        for i in range(6):
+            mem.record_near_miss(f"V{i + 2}", 2.5, "high")
+        assert len(mem._lessons) == 5
+        assert mem._lesson_set == set(mem._lessons)
+        later = time.time() + llm_brain.NEAR_MISS_INTERVAL + 0.1
+        monkeypatch.setattr(llm_brain.time, "time", lambda: later)
+        mem.record_near_miss("V2", 2.5, "high")
+        assert "V2" in mem._lessons[-1]
+
     def test_record_v2x_alert(self):
         mem = AgentMemory("V1")
         mem.record_v2x_alert("V2", "emergency", "ambulance approaching")
@@ -107,6 +147,22 @@ class TestAgentMemory:
         assert "WARNING" in ctx
         assert "stop" in ctx
 
+    def test_memory_context_cached_until_mutation(self):
+        mem = AgentMemory("V1")
+        mem.record_decision("x", {"action": "go", "speed": 10.0, "reason": "clear"})
+        ctx = mem.get_memory_context()
+        assert mem.get_memory_context() is ctx
+        mem.record_near_miss("V2", 2.0, "high")
+        assert "NEAR-MISS" in mem.get_memory_context()
+
+    def test_memory_context_drops_expired_alerts(self):
+        mem = AgentMemory("V1")
+        mem.record_v2x_alert("V2", "warning", "braking hard")
+        assert "V2X ALERTS" in mem.get_memory_context()
+        mem._v2x_alerts[0]["time"] -= 10.0
+        mem._ctx_valid_until -= 10.0
+        assert "V2X ALERTS" not in mem.get_memory_context()
+
     def test_is_stuck_by_consecutive_actions(self):
         mem = AgentMemory("V1")
         for _ in range(20):
@@ -242,3 +298,282 @@ class TestCircuitBreaker:
         time.sleep(0.02)
         cb.record_failure()
         assert cb.state == "closed"
+
+
+class TestDecisionBatcher:
+
+    def _fake_generate(self, calls):
+        async def generate(client, contents, rows=1):
+            calls.append(contents)
+            if contents.startswith(llm_brain.BATCH_INSTRUCTION):
+                rows = json.loads(contents[len(llm_brain.BATCH_INSTRUCTION):])
+                return json.dumps([
+                    {"agent_id": r["agent_id"], "action": "yield", "speed": 3.0, "reason": "batched"}
+                    for r in rows
+                ])
+            return json.dumps({"action": "go", "speed": 10.0, "reason": "single"})
+        return generate
+
+    def test_parse_batch_response(self):
+        text = '[{"agent_id": "V1", "action": "go"}, {"agent_id": "V2", "action": "stop"}, {"x": 1}]'
+        parsed = parse_batch_response(text)
+        assert set(parsed) == {"V1", "V2"}
+        assert parsed["V2"]["action"] == "stop"
+
+    def test_single_request_uses_plain_prompt(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", self._fake_generate(calls))
+        batcher = DecisionBatcher(window=0.01)
+        result = batcher.submit("V1", "prompt V1").result(timeout=2)
+        assert result["reason"] == "single"
+        assert calls == ["prompt V1"]
+
+    def test_concurrent_requests_share_one_call(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", self._fake_generate(calls))
+        batcher = DecisionBatcher(window=0.2)
+        futures = [batcher.submit(f"V{i}", f"prompt V{i}") for i in range(3)]
+        results = [f.result(timeout=2) for f in futures]
+        assert len(calls) == 1
+        assert all(r["reason"] == "batched" for r in results)
+        assert batcher.get_stats()["batched_requests"] == 3
+
+    def test_missing_rows_fall_back_to_single_calls(self, monkeypatch):
+        calls = []
+
+        async def generate(client, contents, rows=1):
+            calls.append(contents)
+            if contents.startswith(llm_brain.BATCH_INSTRUCTION):
+                return '[{"agent_id": "V0", "action": "stop", "speed": 0, "reason": "batched"}]'
+            return '{"action": "go", "speed": 10.0, "reason": "single"}'
+
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", generate)
+        batcher = DecisionBatcher(window=0.2)
+        f0 = batcher.submit("V0", "prompt V0")
+        f1 = batcher.submit("V1", "prompt V1")
+        assert f0.result(timeout=2)["reason"] == "batched"
+        assert f1.result(timeout=2)["reason"] == "single"
+        assert batcher.get_stats()["single_fallbacks"] == 1
+
+    def test_failed_single_calls_run_concurrently(self, monkeypatch):
+        in_flight = []
+        peak = []
+
+        async def generate(client, contents, rows=1):
+            if contents.startswith(llm_brain.BATCH_INSTRUCTION):
+                raise RuntimeError("batch rejected")
+            in_flight.append(contents)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.05)
+            in_flight.remove(contents)
+            return '{"action": "go", "speed": 10.0, "reason": "single"}'
+
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", generate)
+        batcher = DecisionBatcher(window=0.2)
+        futures = [batcher.submit(f"V{i}", f"prompt V{i}") for i in range(4)]
+        assert all(f.result(timeout=2)["reason"] == "single" for f in futures)
+        assert max(peak) == 4
+
+    def test_slow_call_times_out(self, monkeypatch):
+        async def generate(client, contents, rows=1):
+            await asyncio.sleep(1.0)
+            return '{"action": "go", "speed": 10.0, "reason": "late"}'
+
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", generate)
+        batcher = DecisionBatcher(window=0.01, timeout=0.05)
+        future = batcher.submit("V1", "prompt V1")
+        with pytest.raises(TimeoutError):
+            future.result(timeout=2)
+
+    def test_rate_limited_call_is_retried(self, monkeypatch):
+        attempts = []
+
+        class RateLimited(Exception):
+            code = 429
+
+        async def generate(client, contents, rows=1):
+            attempts.append(contents)
+            if len(attempts) == 1:
+                raise RateLimited()
+            return '{"action": "go", "speed": 10.0, "reason": "retried"}'
+
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", generate)
+        monkeypatch.setattr(llm_brain, "LLM_RETRY_BACKOFF", 0.01)
+        batcher = DecisionBatcher(window=0.01, timeout=1.0)
+        assert batcher.submit("V1", "prompt V1").result(timeout=2)["reason"] == "retried"
+        assert len(attempts) == 2
+        assert batcher.get_stats()["retries"] == 1
+
+    def test_non_retryable_error_fails_fast(self, monkeypatch):
+        attempts = []
+
+        async def generate(client, contents, rows=1):
+            attempts.append(contents)
+            raise ValueError("bad response")
+
+        monkeypatch.setattr(llm_brain, "_get_client", lambda: object())
+        monkeypatch.setattr(llm_brain, "_generate", generate)
+        batcher = DecisionBatcher(window=0.01, timeout=1.0)
+        with pytest.raises(ValueError):
+            batcher.submit("V1", "prompt V1").result(timeout=2)
+        assert len(attempts) == 1
+
+
+class TestStreaming:
+
+    def test_json_value_end_across_chunks(self):
+        state = [0, 0, False, False]
+        text = '{"action": "go", "reason": "gap } \\" ['
+        assert json_value_end(text, state) == -1
+        text += '"}'
+        assert json_value_end(text, state) == len(text)
+        state = [0, 0, False, False]
+        assert json_value_end('[{"a": 1}, {"b": 2}] trailing', state) == 20
+
+    def test_stream_stops_after_closing_brace(self, monkeypatch):
+        read = []
+
+        async def chunks():
+            for part in ('{"action": "go", ', '"speed": 8, "reason": "ok"}', "never read"):
+                read.append(part)
+                yield SimpleNamespace(text=part)
+
+        async def generate_content_stream(model, contents, config):
+            return chunks()
+
+        client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(
+            generate_content_stream=generate_content_stream)))
+        monkeypatch.setattr(llm_brain, "LLM_STREAM", True)
+        monkeypatch.setattr(llm_brain, "_config_for", lambda rows: None)
+        text = asyncio.run(llm_brain._generate(client, "prompt"))
+        assert json.loads(text)["speed"] == 8
+        assert len(read) == 2
+
+
+class TestPromptCache:
+
+    def _client(self, create):
+        return SimpleNamespace(aio=SimpleNamespace(caches=SimpleNamespace(create=create)))
+
+    def test_cached_prompt_replaces_system_instruction(self, monkeypatch):
+        sent = []
+
+        async def create(model, config):
+            sent.append(config)
+            return SimpleNamespace(name="cachedContents/abc")
+
+        monkeypatch.setattr(llm_brain, "_batch_configs", {})
+        asyncio.run(llm_brain._refresh_prompt_cache(self._client(create)))
+        try:
+            assert sent[0].display_name.endswith(llm_brain.SYSTEM_PROMPT_HASH)
+            cfg = llm_brain._config_for(1)
+            assert cfg.cached_content == "cachedContents/abc"
+            assert cfg.system_instruction is None
+        finally:
+            llm_brain._set_prompt_cache(None, 0.0)
+
+    def test_failed_cache_falls_back_to_inline_prompt(self, monkeypatch):
+        async def create(model, config):
+            raise RuntimeError("content too small")
+
+        monkeypatch.setattr(llm_brain, "_batch_configs", {})
+        asyncio.run(llm_brain._refresh_prompt_cache(self._client(create)))
+        try:
+            cfg = llm_brain._config_for(1)
+            assert cfg.cached_content is None
+            assert cfg.system_instruction == llm_brain.SYSTEM_PROMPT
+            assert llm_brain._prompt_cache_expires > time.time()
+        finally:
+            llm_brain._set_prompt_cache(None, 0.0)
+
+
+class TestDecisionCache:
+
+    def test_hit_returns_copy(self):
+        cache = DecisionCache()
+        cache.put(("k",), {"action": "go", "speed": 10.0, "reason": "clear"})
+        hit = cache.get(("k",))
+        assert hit == {"action": "go", "speed": 10.0, "reason": "clear"}
+        hit["action"] = "stop"
+        assert cache.get(("k",))["action"] == "go"
+
+    def test_entries_expire(self):
+        cache = DecisionCache(ttl=0.01)
+        cache.put(("k",), {"action": "go", "speed": 10.0, "reason": "clear"})
+        time.sleep(0.02)
+        assert cache.get(("k",)) is None
+        assert cache.get_stats()["cache_entries"] == 0
+
+    def test_lru_eviction(self):
+        cache = DecisionCache(maxsize=2)
+        for k in ("a", "b"):
+            cache.put((k,), {"action": "go"})
+        cache.get(("a",))
+        cache.put(("c",), {"action": "go"})
+        assert cache.get(("b",)) is None
+        assert cache.get(("a",)) is not None
+
+    def test_situation_key_ignores_order_of_others(self):
+        others = [{"id": "V2"}, {"id": "V3"}]
+        k1 = situation_key(10.2, -40.4, 8.7, 90.0, "straight", False, False, "red", others, "low")
+        k2 = situation_key(
+            9.8, -39.6, 8.1, 90.0, "straight", False, False, "red", list(reversed(others)), "low",
+        )
+        assert k1 == k2
+
+    def test_situation_key_separates_emergency_vehicles(self):
+        others = [{"id": "V2"}]
+        car = situation_key(10.0, -40.0, 8.0, 90.0, "straight", False, False, "red", others, "low")
+        ambulance = situation_key(10.0, -40.0, 8.0, 90.0, "straight", True, False, "red", others, "low")
+        assert car != ambulance
+        cache = DecisionCache()
+        cache.put(car, {"action": "stop", "speed": 0.0, "reason": "red"})
+        assert cache.get(ambulance) is None
+
+    def test_entry_ttc_prefers_numeric_value(self):
+        assert entry_ttc({"ttc": "2.3s", "ttc_value": 2.34}) == 2.34
+        assert entry_ttc({"ttc": "2.3s"}) == 2.3
+        assert entry_ttc({"ttc": "inf"}) == float("inf")
+        assert entry_ttc({}) == float("inf")
+
+
+class TestCallPacing:
+
+    def test_interval_scales_with_risk(self):
+        base = llm_brain.LLM_CALL_INTERVAL
+        assert effective_interval("high", False) < base
+        assert effective_interval("medium", False) == base
+        assert effective_interval("low", False) > base
+        assert effective_interval("low", True) == base
+
+    def test_standstill_reuses_last_decision(self, monkeypatch):
+        monkeypatch.setattr(llm_brain, "LLM_ENABLED", True)
+        monkeypatch.setattr(llm_brain, "_circuit_breaker", CircuitBreaker())
+
+        def no_client():
+            raise AssertionError("LLM should not be consulted")
+
+        monkeypatch.setattr(llm_brain, "_get_client", no_client)
+        brain = LLMBrain("V1")
+        brain._last_decision = {"action": "stop", "speed": 0.0, "reason": "red"}
+        brain._last_standstill = ("red", frozenset({"V2"}))
+        result = brain.decide(
+            0.0, -20.0, 0.0, 0.0, "straight", False, False, "red",
+            [{"id": "V2"}], "low", 5.0,
+        )
+        assert result["action"] == "stop"
+
+    def test_summary_matches_full_stats(self):
+        brain = LLMBrain("V1")
+        brain.memory.record_near_miss("V2", 2.0, "high")
+        brain.memory.record_decision("s", {"action": "go", "speed": 5.0, "reason": "r"})
+        summary = brain.get_summary()
+        stats = brain.get_stats()
+        assert summary == {k: stats[k] for k in summary}
+        assert brain.get_summary() is summary
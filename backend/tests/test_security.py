@@ -2,6 +2,13 @@
 import sys
 import os
 import time
+import subprocess
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from v2x_security import (
@@ -9,8 +16,11 @@ from v2x_security import (
     validate_agent_id, validate_message,
     StaleAgentDetector, RateLimiter,
     sanitize_agent,
-    VALID_ACTIONS, VALID_RISKS,
+    VALID_ACTIONS, VALID_RISKS, broadcast_limiter,
 )
+from v2x_channel import channel, V2XBroadcast
+import main
+import v2x_security
 
 
 def test_hmac_sign_verify():
@@ -159,6 +169,34 @@ def test_rate_limiter_reset():
     assert rl.allow("VH_A") is True
 
 
+def test_rate_limiter_window_slides(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(v2x_security.time, "time", lambda: now[0])
+    rl = RateLimiter(max_per_sec=2)
+    assert rl.allow("VH_A") is True
+    now[0] += 0.5
+    assert rl.allow("VH_A") is True
+    assert rl.allow("VH_A") is False
+    now[0] += 0.6
+    assert rl.allow("VH_A") is True
+    assert rl.allow("VH_A") is False
+
+
+def test_rate_limiter_remove_drops_window():
+    rl = RateLimiter(max_per_sec=1)
+    for i in range(50):
+        rl.allow(f"BG_{i}")
+        rl.remove(f"BG_{i}")
+    assert sum(len(buckets) for buckets, _ in rl._shards) == 0
+    assert rl.allow("BG_0") is True
+
+
+def test_channel_remove_agent_releases_broadcast_window():
+    channel.broadcast(V2XBroadcast(from_id="BG_TEST_1", alert_type="test", message="x"))
+    channel.remove_agent("BG_TEST_1")
+    assert all("BG_TEST_1" not in buckets for buckets, _ in broadcast_limiter._shards)
+
+
 def test_sanitize_agent_valid():
     raw = {
         "agent_id": "VH_A", "agent_type": "vehicle",
@@ -187,6 +225,113 @@ def test_sanitize_agent_clamps():
     assert clean["speed"] == 50.0
 
 
+@pytest.mark.parametrize("field,value", [
+    ("x", float("nan")), ("x", float("inf")), ("x", float("-inf")), ("x", 25000.0),
+    ("y", -25000.0), ("y", 12.3456),
+    ("speed", float("nan")), ("speed", -3.0), ("speed", 250.0), ("speed", 13.337),
+    ("direction", float("inf")), ("direction", -10.0), ("direction", 400.0), ("direction", 87.66),
+])
+@pytest.mark.parametrize("rounded", [False, True])
+def test_clamp_agent_numbers_matches_safe_num(field, value, rounded):
+    agent = {"agent_id": "VH_A", "x": 1.0, "y": 2.0, "speed": 5.0, "direction": 90.0, field: value}
+    nums = main._clamp_agent_numbers([agent], rounded)
+    assert nums is not None
+    assert main._safe_agent(agent, nums[0], rounded) == main._safe_agent(agent, None, rounded)
+
+
+def test_only_ws_state_is_rounded():
+    raw = {"agents": {"VH_A": {"agent_id": "VH_A", "x": 12.34567, "y": 0.0, "speed": 5.0, "direction": 87.66}}}
+    assert main.sanitize_full_state(raw)["agents"]["VH_A"]["x"] == 12.34567
+    ws = main.sanitize_full_state(raw, rounded=True)["agents"]["VH_A"]
+    assert (ws["x"], ws["direction"]) == (12.35, 87.7)
+
+
+def test_clamp_agent_numbers_defers_non_numeric():
+    assert main._clamp_agent_numbers([{"x": "abc"}]) is None
+    assert main._clamp_agent_numbers([{"x": None, "y": float("nan")}]) is None
+
+
+def test_state_delta_carries_in_place_stats_changes():
+    stats = {"collisions_prevented": 0, "elapsed_time": 1.0}
+    infra = {"phase": "NS_GREEN", "stats": {"phase_changes": 0}}
+    raw = {"agents": {}, "stats": stats, "infrastructure": infra}
+    prev = main.sanitize_full_state(raw)
+    stats["elapsed_time"] = 1.5
+    stats["collisions_prevented"] += 1
+    infra["stats"]["phase_changes"] += 1
+    patch = main._state_delta(prev, main.sanitize_full_state(raw))
+    assert patch["set"]["stats"] == {"collisions_prevented": 1, "elapsed_time": 1.5}
+    assert patch["set"]["infrastructure"]["stats"]["phase_changes"] == 1
+
+
+def _rest_clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_rest_limiter_burst_then_429(monkeypatch):
+    _rest_clock(monkeypatch)
+    monkeypatch.setattr(main, "_rest_limiter", main._RestRateLimiter(3))
+    request = SimpleNamespace(client=SimpleNamespace(host="10.0.0.1"))
+    for _ in range(3):
+        asyncio.run(main.rate_limit(request))
+    for _ in range(5):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(main.rate_limit(request))
+        assert exc.value.status_code == 429
+
+
+def test_rest_limiter_refills_after_wait(monkeypatch):
+    now = _rest_clock(monkeypatch)
+    rl = main._RestRateLimiter(3)
+    assert all(rl.allow("1.1.1.1") for _ in range(3))
+    assert rl.allow("1.1.1.1") is False
+    now[0] += 10.0
+    assert rl.allow("1.1.1.1") is False
+    now[0] += 10.0
+    assert rl.allow("1.1.1.1") is True
+    assert rl.allow("1.1.1.1") is False
+
+
+def test_rest_limiter_evicts_least_recently_used_ip(monkeypatch):
+    now = _rest_clock(monkeypatch)
+    rl = main._RestRateLimiter(3, max_ips=2)
+    rl.allow("a")
+    now[0] += 1.0
+    rl.allow("b")
+    now[0] += 1.0
+    rl.allow("a")
+    rl.allow("c")
+    assert list(rl._buckets) == ["a", "c"]
+
+
+def test_rest_limiter_prunes_idle_buckets(monkeypatch):
+    now = _rest_clock(monkeypatch)
+    rl = main._RestRateLimiter(3)
+    rl.allow("a")
+    rl.allow("b")
+    now[0] += main.REST_RATE_LIMIT_IDLE - 1.0
+    rl.allow("b")
+    now[0] += 2.0
+    rl.allow("c")
+    assert list(rl._buckets) == ["b", "c"]
+
+
+
+def test_ws_limits_live_only_in_main(tmp_path):
+    assert not hasattr(v2x_security, "sanitize_full_state")
+    assert not hasattr(v2x_security, "MAX_WS_CONNECTIONS")
+    assert [r.path for r in main.app.routes].count("/ws") == 1
+    # fresh interpreter: the limit is read once at import; cwd keeps history.db out of the tree
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    env = {**os.environ, "MAX_WS_CONNECTIONS": "3", "PYTHONPATH": backend}
+    out = subprocess.run(
+        [sys.executable, "-c", "import main; print(main.MAX_WS_CONNECTIONS)"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert out.stdout.strip().splitlines()[-1] == "3"
+
+
 if __name__ == "__main__":
-    import pytest
     pytest.main([__file__, "-v"])
@@ -3,9 +3,13 @@ import threading
 import time
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from collections import deque
 
+from v2x_security import (
+    sign_message, validate_message, verify_signature, stale_detector, broadcast_limiter,
+)
+
 logger = logging.getLogger("v2x_channel")
 
 
@@ -27,6 +31,8 @@ class V2XMessage:
     pulling_over: bool = False
     arrested: bool = False
     hmac_signature: str = ""
+    # collision_detector's numeric row for this message, filled on first scan
+    _kinematics: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
 
 
 @dataclass
@@ -48,11 +54,12 @@ class V2XChannel:
         self._broadcasts: deque = deque(maxlen=200)
         self._rejected_messages = 0
         self._rejected_broadcasts = 0
+        # bumped on every agent state change; readers compare it without the lock
+        self.version = 0
+        # set alongside every version bump so monitors can wait instead of polling
+        self.changed = threading.Event()
 
     def publish(self, message: V2XMessage):
-        from v2x_security import (sign_message, validate_message,
-                                   stale_detector)
-
         valid, sanitized, errors = validate_message(
             message.agent_id, message.agent_type,
             message.x, message.y, message.speed,
@@ -86,10 +93,10 @@ class V2XChannel:
             self._history.append(message)
             if len(self._history) > self._max_history:
                 self._history.pop(0)
+            self.version += 1
+        self.changed.set()
 
     def broadcast(self, alert: V2XBroadcast):
-        from v2x_security import broadcast_limiter
-
         if not broadcast_limiter.allow(alert.from_id):
             self._rejected_broadcasts += 1
             return
@@ -120,27 +127,30 @@ class V2XChannel:
             return {k: v for k, v in self._messages.items() if k != my_id}
 
     def remove_agent(self, agent_id: str):
-        from v2x_security import stale_detector
         with self._lock:
             self._messages.pop(agent_id, None)
+            self.version += 1
+        self.changed.set()
         stale_detector.remove(agent_id)
+        broadcast_limiter.remove(agent_id)
 
     def cleanup_stale_agents(self) -> list:
-        from v2x_security import stale_detector
         stale = stale_detector.stale_agents()
         removed = []
         for aid in stale:
             with self._lock:
                 if aid in self._messages:
                     self._messages.pop(aid)
+                    self.version += 1
                     removed.append(aid)
             stale_detector.remove(aid)
+            broadcast_limiter.remove(aid)
         if removed:
+            self.changed.set()
             logger.warning(f"[SECURITY] Agenti INACTIVI stersi: {removed}")
         return removed
 
     def verify_message(self, agent_id: str) -> bool:
-        from v2x_security import verify_signature
         with self._lock:
             msg = self._messages.get(agent_id)
             if msg is None:
@@ -174,31 +184,38 @@ class V2XChannel:
                 }
             ]
 
+    @staticmethod
+    def _message_dict(m: V2XMessage) -> dict:
+        return {
+            "agent_id": m.agent_id,
+            "agent_type": m.agent_type,
+            "x": m.x,
+            "y": m.y,
+            "speed": m.speed,
+            "direction": m.direction,
+            "intention": m.intention,
+            "risk_level": m.risk_level,
+            "decision": m.decision,
+            "timestamp": m.timestamp,
+            "is_emergency": m.is_emergency,
+            "is_police": m.is_police,
+            "is_drunk": m.is_drunk,
+            "pulling_over": m.pulling_over,
+            "arrested": m.arrested,
+        }
+
     def to_dict(self) -> dict:
+        return self.get_snapshot()[2]
+
+    def get_snapshot(self) -> Tuple[int, Dict[str, V2XMessage], dict]:
+        """(version, states, serialized states) from a single lock acquisition."""
         with self._lock:
-            return {
-                agent_id: {
-                    "agent_id": m.agent_id,
-                    "agent_type": m.agent_type,
-                    "x": m.x,
-                    "y": m.y,
-                    "speed": m.speed,
-                    "direction": m.direction,
-                    "intention": m.intention,
-                    "risk_level": m.risk_level,
-                    "decision": m.decision,
-                    "timestamp": m.timestamp,
-                    "is_emergency": m.is_emergency,
-                    "is_police": m.is_police,
-                    "is_drunk": m.is_drunk,
-                    "pulling_over": m.pulling_over,
-                    "arrested": m.arrested,
-                }
-                for agent_id, m in self._messages.items()
-            }
+            version = self.version
+            states = dict(self._messages)
+        # published messages are replaced, never mutated, so serializing outside the lock is safe
+        return version, states, {aid: self._message_dict(m) for aid, m in states.items()}
 
     def get_security_stats(self) -> dict:
-        from v2x_security import stale_detector
         return {
             "rejected_messages": self._rejected_messages,
             "rejected_broadcasts": self._rejected_broadcasts,
@@ -207,11 +224,12 @@ class V2XChannel:
         }
 
     def clear_all(self):
-        from v2x_security import stale_detector, broadcast_limiter
         with self._lock:
             self._messages.clear()
             self._history.clear()
             self._broadcasts.clear()
+            self.version += 1
+        self.changed.set()
         self._rejected_messages = 0
         self._rejected_broadcasts = 0
         stale_detector.reset()
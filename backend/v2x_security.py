@@ -7,7 +7,7 @@ import math
 import logging
 import threading
 from typing import Optional, Dict, Any, Tuple
-from collections import defaultdict
+from collections import defaultdict, deque
 
 logger = logging.getLogger("v2x_security")
 
@@ -17,7 +17,7 @@ _HMAC_KEY_BYTES = V2X_HMAC_KEY.encode("utf-8")
 
 AGENT_STALE_TIMEOUT = float(os.getenv("AGENT_STALE_TIMEOUT", "5.0"))
 BROADCAST_RATE_LIMIT = int(os.getenv("BROADCAST_RATE_LIMIT", "10"))
-MAX_WS_CONNECTIONS = int(os.getenv("MAX_WS_CONNECTIONS", "20"))
+RATE_LIMIT_STRIPES = 16
 
 COORD_MIN, COORD_MAX = -500.0, 500.0
 SPEED_MIN, SPEED_MAX = 0.0, 50.0
@@ -155,22 +155,31 @@ class StaleAgentDetector:
 class RateLimiter:
     def __init__(self, max_per_sec: int = BROADCAST_RATE_LIMIT):
         self._max = max_per_sec
-        self._lock = threading.Lock()
-        self._buckets: Dict[str, list] = defaultdict(list)
+        # 1s sliding window per agent, sharded so vehicle threads rarely share a lock
+        self._shards = [(defaultdict(deque), threading.Lock()) for _ in range(RATE_LIMIT_STRIPES)]
 
     def allow(self, agent_id: str) -> bool:
         now = time.time()
-        with self._lock:
-            bucket = self._buckets[agent_id]
-            self._buckets[agent_id] = [t for t in bucket if now - t < 1.0]
-            if len(self._buckets[agent_id]) >= self._max:
+        buckets, lock = self._shards[hash(agent_id) % RATE_LIMIT_STRIPES]
+        with lock:
+            bucket = buckets[agent_id]
+            while bucket and now - bucket[0] >= 1.0:
+                bucket.popleft()
+            if len(bucket) >= self._max:
                 return False
-            self._buckets[agent_id].append(now)
+            bucket.append(now)
             return True
 
+    def remove(self, agent_id: str):
+        # agent ids are not reused (BG_ ids come from a counter): drop windows of departed agents
+        buckets, lock = self._shards[hash(agent_id) % RATE_LIMIT_STRIPES]
+        with lock:
+            buckets.pop(agent_id, None)
+
     def reset(self):
-        with self._lock:
-            self._buckets.clear()
+        for buckets, lock in self._shards:
+            with lock:
+                buckets.clear()
 
 
 def _safe_str(val: Any, maxlen: int = MAX_STR_LEN) -> str:
@@ -204,90 +213,5 @@ def sanitize_agent(raw: dict) -> dict:
     }
 
 
-def sanitize_full_state(raw: dict) -> dict:
-    safe: dict = {
-        "scenario": _safe_str(raw.get("scenario")) or None,
-        "running":  bool(raw.get("running")),
-    }
-
-    agents_raw = raw.get("agents") or {}
-    safe["agents"] = {
-        _safe_str(k, MAX_ID_LEN): sanitize_agent(v)
-        for k, v in agents_raw.items() if isinstance(v, dict)
-    }
-
-    infra = raw.get("infrastructure") or {}
-    if isinstance(infra, dict) and infra:
-        safe["infrastructure"] = {
-            "agent_id":        _safe_str(infra.get("agent_id"), MAX_ID_LEN),
-            "phase":           _safe_str(infra.get("phase")),
-            "phase_timer":     round(_safe_num(infra.get("phase_timer")), 1),
-            "phase_remaining": round(_safe_num(infra.get("phase_remaining")), 1),
-            "phase_duration":  round(_safe_num(infra.get("phase_duration"), 15), 1),
-            "emergency_mode":  bool(infra.get("emergency_mode")),
-            "emergency_axis":  _safe_str(infra.get("emergency_axis"), 10) or None,
-            "recommendations": {
-                _safe_str(vid, MAX_ID_LEN): {
-                    "recommended_speed": round(_clamp(_safe_num(r.get("recommended_speed")), 0, SPEED_MAX), 1),
-                    "action":            _safe_str(r.get("action")),
-                    "signal":            _safe_str(r.get("signal"), 10),
-                    "time_to_green":     round(_safe_num(r.get("time_to_green")), 1),
-                }
-                for vid, r in (infra.get("recommendations") or {}).items()
-                if isinstance(r, dict)
-            },
-            "stats": {k: v for k, v in (infra.get("stats") or {}).items()
-                      if isinstance(v, (int, float))},
-        }
-    else:
-        safe["infrastructure"] = {}
-
-    pairs = raw.get("collision_pairs") or []
-    safe["collision_pairs"] = [
-        {
-            "agent1": _safe_str(p.get("agent1"), MAX_ID_LEN),
-            "agent2": _safe_str(p.get("agent2"), MAX_ID_LEN),
-            "risk":   p.get("risk") if p.get("risk") in VALID_RISKS else "low",
-            "ttc":    round(_safe_num(p.get("ttc"), 999), 2),
-        }
-        for p in pairs[:50] if isinstance(p, dict)
-    ]
-
-    safe["stats"] = {k: v for k, v in (raw.get("stats") or {}).items()
-                     if isinstance(v, (int, float))}
-
-    grid_raw = raw.get("grid")
-    if isinstance(grid_raw, dict):
-        safe["grid"] = {
-            "intersections": [
-                {"x": round(_clamp(_safe_num(i.get("x")), COORD_MIN, COORD_MAX), 1),
-                 "y": round(_clamp(_safe_num(i.get("y")), COORD_MIN, COORD_MAX), 1)}
-                for i in (grid_raw.get("intersections") or []) if isinstance(i, dict)
-            ],
-            "grid_cols": int(_safe_num(grid_raw.get("grid_cols"), 1)),
-            "grid_rows": int(_safe_num(grid_raw.get("grid_rows"), 1)),
-            "grid_spacing": round(_safe_num(grid_raw.get("grid_spacing"), 300), 1),
-            "demo_intersection": {
-                "x": round(_clamp(_safe_num((grid_raw.get("demo_intersection") or {}).get("x")), COORD_MIN, COORD_MAX), 1),
-                "y": round(_clamp(_safe_num((grid_raw.get("demo_intersection") or {}).get("y")), COORD_MIN, COORD_MAX), 1),
-            },
-        }
-
-    safe["background_traffic"] = bool(raw.get("background_traffic"))
-
-    tl_raw = raw.get("traffic_light_intersections") or []
-    safe["traffic_light_intersections"] = [
-        {
-            "x": round(_clamp(_safe_num(tl.get("x")), COORD_MIN, COORD_MAX), 1),
-            "y": round(_clamp(_safe_num(tl.get("y")), COORD_MIN, COORD_MAX), 1),
-            "phase": _safe_str(tl.get("phase"), MAX_STR_LEN),
-        }
-        for tl in tl_raw[:20] if isinstance(tl, dict)
-    ]
-
-    safe["timestamp"] = round(time.time(), 1)
-    return safe
-
-
 stale_detector = StaleAgentDetector()
 broadcast_limiter = RateLimiter()